@@ -0,0 +1,85 @@
+import hashlib
+import os
+import re
+import subprocess
+import profiling
+
+# citeproc parses every entry of the bibliography it is given, though the
+# thesis only cites some of References.bib. This finds the keys cited in the
+# rendered markdown, which includes the [@Name] citations written by
+# cited_list and the counterexample citations, and converts just those
+# entries to CSL JSON. The result is cached by the cited keys and a hash of
+# the .bib file.
+source = 'References.bib'
+cache_dir = '.build_cache'
+
+citation = re.compile(r'(?<![\w@])@(\{[^}]+\}|\w[\w:.#$%&\-+?<>~/]*)')
+entry_start = re.compile(r'^@(\w+)\s*[{(]\s*([^,\s]*)', re.MULTILINE)
+crossref = re.compile(r'^\s*(?:crossref|xdata)\s*=\s*[{"]([^}"]+)', re.MULTILINE | re.IGNORECASE)
+
+def cited_keys(markdown):
+    keys = set()
+    for match in citation.finditer(markdown):
+        key = match.group(1)
+        # Like pandoc, punctuation can only appear inside a key
+        keys.add(key[1:-1] if key.startswith('{') else key.rstrip(':.#$%&-+?<>~/'))
+    return keys
+
+def entries(bib):
+    # Every entry of a .bib file by key. @string and @preamble are returned
+    # separately, entries may use them wherever they are cited from.
+    found = {}
+    shared = []
+    starts = list(entry_start.finditer(bib))
+    for i, match in enumerate(starts):
+        text = bib[match.start():starts[i + 1].start() if i + 1 < len(starts) else len(bib)]
+        kind = match.group(1).lower()
+        if kind in ('string', 'preamble'):
+            shared.append(text)
+        elif kind != 'comment':
+            found[match.group(2)] = text
+    return found, shared
+
+@profiling.stage('bibliography')
+def prune(markdown_path, bib=source):
+    # The path of a CSL JSON bibliography with only the entries cited in
+    # markdown_path
+    with open(markdown_path, 'r') as f:
+        cited = cited_keys(f.read())
+    with open(bib, 'r') as f:
+        bib_text = f.read()
+    found, shared = entries(bib_text)
+
+    keep = set()
+    pending = [key for key in cited if key in found]
+    while pending:
+        key = pending.pop()
+        if key not in keep:
+            keep.add(key)
+            pending.extend(parent for parent in crossref.findall(found[key]) if parent in found)
+    keys = sorted(keep)
+
+    hasher = hashlib.sha256(bib_text.encode('utf8'))
+    hasher.update('\n'.join(keys).encode('utf8'))
+    path = os.path.join(cache_dir, 'bibliography-{}.json'.format(hasher.hexdigest()))
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        pruned = path[:-len('.json')] + '.bib'
+        with open(pruned, 'w') as f:
+            f.write(''.join(shared + [found[key] for key in keys]))
+        subprocess.run(['pandoc', '--from', 'biblatex', '--to', 'csljson', pruned, '-o', path + '.partial'], check=True)
+        os.replace(path + '.partial', path)
+    return path
+
+def with_bibliography(args, path):
+    # pandoc arguments using path as the only bibliography. A --bibliography
+    # on the command line replaces the one named in the front matter.
+    result = []
+    i = 0
+    while i < len(args):
+        if args[i] == '--bibliography':
+            i += 2
+            continue
+        result.append(args[i])
+        i += 1
+    return result + ['--bibliography', path]
@@ -0,0 +1,129 @@
+import hashlib
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+from zipfile import ZipFile
+import bibliography
+import compile
+import profiling
+import shards
+import snapshot
+
+# Each stage of the build is keyed by a hash of its inputs, a stage is only
+# run again when one of those inputs changes.
+cache_dir = '.build_cache'
+
+data_files = ['compile.py', 'msc_index.py', 'dataset.py', 'snapshot.py', 'results/library_stats.csv', 'results/classification.csv']
+bibliography_files = ['References.bib', 'acm.csl']
+
+# The pandoc runs themselves are defined next to the targets in compile.py
+pandoc_args = compile.pandoc_args
+templates = compile.templates
+outputs = compile.outputs
+
+def hash_file(hasher, path):
+    hasher.update(path.encode('utf8'))
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            hasher.update(chunk)
+
+def hash_zip(hasher, path):
+    # The zip directory already holds a CRC of every member, so there is no
+    # need to decompress anything to notice a change
+    with ZipFile(path, 'r') as all_data:
+        for info in sorted(all_data.infolist(), key=lambda x: x.filename):
+            hasher.update('{}:{}:{}'.format(info.filename, info.CRC, info.file_size).encode('utf8'))
+
+def data_key():
+    hasher = hashlib.sha256()
+    hash_zip(hasher, 'results/all_data.zip')
+    for path in data_files:
+        hash_file(hasher, path)
+    return hasher.hexdigest()
+
+def render_key(data_hash, target):
+    hasher = hashlib.sha256()
+    hasher.update(data_hash.encode('utf8'))
+    hasher.update(target.encode('utf8'))
+    hash_file(hasher, 'index.md')
+    return hasher.hexdigest()
+
+def pandoc_key(source, target):
+    hasher = hashlib.sha256()
+    hasher.update(' '.join(pandoc_args[target]).encode('utf8'))
+    for path in [source, templates[target], 'shards.py', 'bibliography.py'] + bibliography_files:
+        hash_file(hasher, path)
+    return hasher.hexdigest()
+
+def partial_path(path):
+    # pandoc picks the output format from the extension, so the partial
+    # output keeps it and is only moved into place once pandoc succeeds
+    return os.path.join(cache_dir, 'partial-' + os.path.basename(path))
+
+def cache_path(stage, key, extension):
+    return os.path.join(cache_dir, '{}-{}.{}'.format(stage, key, extension))
+
+def copy_if_changed(source, destination):
+    if os.path.exists(destination):
+        with open(source, 'rb') as a, open(destination, 'rb') as b:
+            if a.read() == b.read():
+                return
+    shutil.copyfile(source, destination)
+
+class Build:
+    def __init__(self):
+        self.data_hash = data_key()
+        self.data = None
+
+    def load_data(self):
+        if self.data is None:
+            path = cache_path('data', self.data_hash, 'pickle')
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    self.data = pickle.load(f)
+            else:
+                print("Loading data")
+                with profiling.stage('data'):
+                    self.data = compile.load_data(snapshot.update())
+                with open(path, 'wb') as f:
+                    pickle.dump(self.data, f)
+        return self.data
+
+    def render(self, target):
+        path = cache_path('render', render_key(self.data_hash, target), 'md')
+        if os.path.exists(path):
+            print("Template for {} is up to date".format(target))
+        else:
+            print("Creating Template")
+            result = compile.render(self.load_data(), target)
+            with open(path, 'w') as out:
+                out.write(result)
+        copy_if_changed(path, compile.targets[target])
+        return compile.targets[target]
+
+    def pandoc(self, target):
+        source = self.render(target)
+        path = cache_path('pandoc', pandoc_key(source, target), outputs[target].split('.')[-1])
+        if os.path.exists(path):
+            print("{} is up to date".format(outputs[target]))
+        else:
+            print("Recompiling")
+            partial = partial_path(path)
+            with profiling.stage('pandoc', target=target):
+                shards.run(bibliography.with_bibliography(pandoc_args[target], bibliography.prune(source)), source, partial)
+            os.replace(partial, path)
+        copy_if_changed(path, outputs[target])
+
+if __name__ == '__main__':
+    profiling.start()
+    os.makedirs(cache_dir, exist_ok=True)
+    build = Build()
+    try:
+        for target in (outputs if sys.argv[1] == 'all' else [sys.argv[1]]):
+            build.pandoc(target)
+    except subprocess.CalledProcessError as error:
+        # shards.py keeps what pandoc printed on the error
+        sys.stderr.write(error.stderr or '')
+        raise SystemExit(error.returncode)
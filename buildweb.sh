@@ -1,5 +1,2 @@
 #!/usr/bin/env fish
-echo "Creating Template"
-python compile.py html
-echo "Recompiling"
-pandoc --from markdown+pipe_tables --template mytemplate.md --toc -F pandoc-csv2table -F pandoc-crossref --no-highlight --mathjax -C build.html.md -o index.html
+python build.py html
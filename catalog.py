@@ -0,0 +1,324 @@
+import argparse
+import collections
+import csv
+import io
+import json
+import os
+import sqlite3
+from zipfile import ZipFile
+import dataset
+import msc_index
+
+# Every module of every library in one SQLite database. The library CSVs in
+# itp_widget/src/library_data, classification.csv and msc.json are bulk loaded
+# into it, duplicates are resolved and statistics computed with indexed
+# queries, and the library CSVs are written back out for the widget.
+#
+#   python catalog.py load catalog.sqlite itp_widget/src --classification results/classification.csv
+#   python catalog.py dedupe catalog.sqlite
+#   python catalog.py export catalog.sqlite itp_widget/src
+schema = '''
+CREATE TABLE IF NOT EXISTS itps (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS libraries (
+    id INTEGER PRIMARY KEY,
+    itp_id INTEGER NOT NULL REFERENCES itps(id),
+    section TEXT NOT NULL,
+    file TEXT,
+    url TEXT,
+    type TEXT,
+    module_def TEXT,
+    module_justification TEXT,
+    -- The header of the library CSV, the crawlers do not all agree on one
+    fields TEXT,
+    UNIQUE (itp_id, section)
+);
+CREATE TABLE IF NOT EXISTS msc (
+    code TEXT PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS modules (
+    id INTEGER PRIMARY KEY,
+    library_id INTEGER NOT NULL REFERENCES libraries(id),
+    position INTEGER NOT NULL,
+    package TEXT NOT NULL,
+    module TEXT,
+    category TEXT,
+    authors TEXT,
+    description TEXT,
+    url TEXT,
+    msc TEXT,
+    verified TEXT
+);
+CREATE INDEX IF NOT EXISTS modules_package ON modules (library_id, package);
+CREATE INDEX IF NOT EXISTS modules_position ON modules (library_id, position);
+CREATE INDEX IF NOT EXISTS modules_msc ON modules (msc);
+-- The verification state of every module, as exported from the widget
+CREATE TABLE IF NOT EXISTS classifications (
+    id INTEGER PRIMARY KEY,
+    library_id INTEGER NOT NULL REFERENCES libraries(id),
+    package TEXT NOT NULL,
+    msc TEXT NOT NULL,
+    verified TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS classifications_library ON classifications (library_id, msc, verified);
+CREATE INDEX IF NOT EXISTS classifications_verified ON classifications (verified, msc);
+'''
+
+module_columns = ['package', 'module', 'category', 'authors', 'description', 'url', 'msc', 'verified']
+library_columns = ['file', 'url', 'type', 'module_def', 'module_justification']
+library_fieldnames = ['name', 'section'] + library_columns
+
+# SQL versions of the tests dataset.Packages makes on an MSC code
+unclassified = "c.msc IN ('', 'NA', 'None', '??-XX')"
+excluded = "substr(c.msc, 1, 7) = 'Exclude'"
+unsure = "substr(lower(c.msc), -2) = 'xx'"
+
+class Source:
+    # itp_widget/src, or all_data.zip which has the same layout
+    def __init__(self, path):
+        self.zip = ZipFile(path, 'r') if path.endswith('.zip') else None
+        self.path = path
+
+    def exists(self, name):
+        if self.zip is not None:
+            return name in self.zip.namelist()
+        return os.path.exists(os.path.join(self.path, name))
+
+    def open(self, name):
+        if self.zip is not None:
+            return io.TextIOWrapper(self.zip.open(name, mode='r'), encoding='utf8', newline='')
+        return open(os.path.join(self.path, name), 'r', newline='')
+
+    def read(self, name):
+        if self.zip is not None:
+            return self.zip.read(name)
+        with open(os.path.join(self.path, name), 'rb') as f:
+            return f.read()
+
+class Catalog:
+    def __init__(self, path=':memory:'):
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(schema)
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    def itp_id(self, name):
+        self.connection.execute('INSERT OR IGNORE INTO itps (name) VALUES (?)', (name,))
+        return self.connection.execute('SELECT id FROM itps WHERE name = ?', (name,)).fetchone()[0]
+
+    def library_id(self, itp, section):
+        itp_id = self.itp_id(itp)
+        self.connection.execute('INSERT OR IGNORE INTO libraries (itp_id, section) VALUES (?, ?)', (itp_id, section))
+        return self.connection.execute('SELECT id FROM libraries WHERE itp_id = ? AND section = ?', (itp_id, section)).fetchone()[0]
+
+    def library(self, library_id):
+        return self.connection.execute('SELECT itps.name, section FROM libraries JOIN itps ON itps.id = itp_id WHERE libraries.id = ?', (library_id,)).fetchone()
+
+    def load_msc(self, index):
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO msc (code, name) VALUES (?, ?)', zip(index.codes, index.names))
+
+    def load_libraries(self, rows):
+        with self.connection:
+            for line in rows:
+                library_id = self.library_id(line['name'], line['section'])
+                self.connection.execute(
+                    'UPDATE libraries SET {} WHERE id = ?'.format(', '.join('{} = ?'.format(column) for column in library_columns)),
+                    [line.get(column) for column in library_columns] + [library_id])
+
+    def load_modules(self, library_id, reader):
+        # Replaces whatever the library held before with the rows of a library CSV
+        with self.connection:
+            self.connection.execute('DELETE FROM modules WHERE library_id = ?', (library_id,))
+            self.connection.execute('UPDATE libraries SET fields = ? WHERE id = ?', (','.join(reader.fieldnames), library_id))
+            self.connection.executemany(
+                'INSERT INTO modules (library_id, position, {}) VALUES (?, ?, {})'.format(', '.join(module_columns), ', '.join('?' * len(module_columns))),
+                ([library_id, position] + [line.get(column) for column in module_columns] for position, line in enumerate(reader)))
+
+    def load_classification(self, reader):
+        name = 'Package' if 'Package' in reader.fieldnames else 'Name'
+        libraries = {}
+        with self.connection:
+            self.connection.execute('DELETE FROM classifications')
+            rows = []
+            for line in reader:
+                key = (line['ITP'], line['Library'])
+                if key not in libraries:
+                    libraries[key] = self.library_id(*key)
+                rows.append((libraries[key], line[name], line['MSC'], line['Verified']))
+            self.connection.executemany('INSERT INTO classifications (library_id, package, msc, verified) VALUES (?, ?, ?, ?)', rows)
+
+    def load_source(self, path):
+        source = Source(path)
+        if source.exists('msc.json'):
+            self.load_msc(msc_index.MscIndex.from_tree(json.loads(source.read('msc.json'))))
+        with source.open('libraries.csv') as f:
+            libraries = list(csv.DictReader(f))
+        self.load_libraries(libraries)
+        for line in libraries:
+            name = 'library_data/' + line['file']
+            if source.exists(name):
+                with source.open(name) as f:
+                    self.load_modules(self.library_id(line['name'], line['section']), csv.DictReader(f))
+
+    def fields(self, library_id):
+        return self.connection.execute('SELECT fields FROM libraries WHERE id = ?', (library_id,)).fetchone()[0].split(',')
+
+    def modules(self, library_id):
+        cursor = self.connection.execute('SELECT {} FROM modules WHERE library_id = ? ORDER BY position'.format(', '.join(module_columns)), (library_id,))
+        return [dict(zip(module_columns, line)) for line in cursor]
+
+    def deduplicate(self, library_id=None, prefer_verified=True):
+        # Keeps one row per package, where its first occurrence was. The row
+        # kept is the last verified one, or the first if none were verified.
+        # Without prefer_verified the last row is kept.
+        keep = "WHERE m.id = first.id OR m.verified != ''" if prefer_verified else ''
+        where = '' if library_id is None else 'WHERE library_id = {:d}'.format(library_id)
+        with self.connection:
+            self.connection.execute('DROP TABLE IF EXISTS temp.kept')
+            self.connection.execute('''
+                CREATE TEMP TABLE kept AS
+                SELECT MAX(m.id) AS id, first.position AS position FROM modules m
+                JOIN (SELECT library_id, package, MIN(id) AS id, MIN(position) AS position FROM modules {where} GROUP BY library_id, package) first
+                  ON first.library_id = m.library_id AND first.package = m.package
+                {keep}
+                GROUP BY m.library_id, m.package'''.format(where=where, keep=keep))
+            removed = self.connection.execute('DELETE FROM modules WHERE {} id NOT IN (SELECT id FROM kept)'.format('' if library_id is None else 'library_id = {:d} AND'.format(library_id))).rowcount
+            self.connection.execute('UPDATE modules SET position = (SELECT position FROM kept WHERE kept.id = modules.id) WHERE id IN (SELECT id FROM kept)')
+            self.connection.execute('DROP TABLE kept')
+        return removed
+
+    def merge_verified(self, library_id, other_id):
+        # Every package of library_id that is verified in other_id takes the
+        # last verified row from other_id
+        columns = [column for column in module_columns if column != 'package']
+        with self.connection:
+            return self.connection.execute('''
+                UPDATE modules SET {assign}
+                FROM (SELECT * FROM modules WHERE id IN (
+                    SELECT MAX(id) FROM modules WHERE library_id = ? AND verified != '' GROUP BY package)) other
+                WHERE modules.library_id = ? AND modules.package = other.package'''.format(
+                    assign=', '.join('{0} = other.{0}'.format(column) for column in columns)), (other_id, library_id)).rowcount
+
+    def unknown_codes(self):
+        # Codes given to modules that are not in the MSC
+        return self.connection.execute('''
+            SELECT DISTINCT m.msc FROM modules m
+            LEFT JOIN msc ON msc.code = CASE WHEN lower(substr(m.msc, 3)) = '-xx' THEN substr(m.msc, 1, 2) || '-XX' ELSE m.msc END
+            WHERE msc.code IS NULL AND m.msc != '' AND substr(m.msc, 1, 7) != 'Exclude' ORDER BY m.msc''').fetchall()
+
+    def write_library(self, library_id, path, fieldnames=None):
+        fieldnames = fieldnames or self.fields(library_id)
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows({field: '' if value is None else value for field, value in line.items()} for line in self.modules(library_id))
+
+    def export(self, directory):
+        # Writes libraries.csv and every library CSV the way the widget reads them
+        os.makedirs(os.path.join(directory, 'library_data'), exist_ok=True)
+        cursor = self.connection.execute('SELECT libraries.id, fields, itps.name, section, {} FROM libraries JOIN itps ON itps.id = itp_id WHERE file IS NOT NULL ORDER BY libraries.id'.format(', '.join(library_columns)))
+        libraries = [dict(zip(['id', 'fields'] + library_fieldnames, line)) for line in cursor]
+        with open(os.path.join(directory, 'libraries.csv'), 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=library_fieldnames, extrasaction='ignore', lineterminator='\n')
+            writer.writeheader()
+            writer.writerows(libraries)
+        for library in libraries:
+            if library['fields'] is not None:
+                self.write_library(library['id'], os.path.join(directory, 'library_data', library['file']), library['fields'].split(','))
+
+    # The statistics compile.py needs, answered the same way as dataset.Packages
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM classifications').fetchone()[0]
+
+    def library_counts(self):
+        names = ['total', 'unclassified', 'unverified', 'verified', 'excluded'] + list(dataset.exclusion_counters.values()) + ['unsure', 'sure']
+        counted = "NOT {} AND c.verified != ''".format(unclassified)
+        cursor = self.connection.execute('''
+            SELECT i.name, l.section, COUNT(*),
+                SUM({unclassified}),
+                SUM(NOT {unclassified} AND c.verified = ''),
+                SUM({counted}),
+                SUM({counted} AND {excluded}),
+                {exclusions},
+                SUM({counted} AND NOT {excluded} AND {unsure}),
+                SUM({counted} AND NOT {excluded} AND NOT {unsure})
+            FROM classifications c JOIN libraries l ON l.id = c.library_id JOIN itps i ON i.id = l.itp_id
+            GROUP BY c.library_id'''.format(
+                unclassified=unclassified, counted=counted, excluded=excluded, unsure=unsure,
+                exclusions=', '.join("SUM({} AND c.msc = '{}')".format(counted, code) for code in dataset.exclusion_counters)))
+        counts = {}
+        for line in cursor:
+            summary = dataset.empty_counts()
+            summary.update(zip(names, line[2:]))
+            counts[(line[0], line[1])] = dataset.finish_counts(summary)
+        return counts
+
+    def verified_codes(self):
+        return CodeQuery(self.connection)
+
+    def category_counts(self):
+        counts = {}
+        cursor = self.connection.execute('''
+            SELECT c.msc, i.name, COUNT(*) FROM classifications c
+            JOIN libraries l ON l.id = c.library_id JOIN itps i ON i.id = l.itp_id
+            WHERE NOT {} AND c.msc != '' GROUP BY c.msc, i.name'''.format(excluded))
+        for msc, itp, count in cursor:
+            top = msc[:2]
+            if top not in counts:
+                counts[top] = {'total': 0, 'mid': collections.Counter(), 'low': collections.Counter(), 'provers': collections.Counter()}
+            category = counts[top]
+            category['total'] += count
+            category['mid'][msc[:3]] += count
+            category['low'][msc] += count
+            category['provers'][itp] += count
+        return counts
+
+class CodeQuery:
+    # msc_index.CodeCounts over the modules marked Yes, as range queries on
+    # the classifications_verified index
+    def __init__(self, connection):
+        self.connection = connection
+
+    def prefix(self, prefix):
+        return self.connection.execute("SELECT COUNT(*) FROM classifications WHERE verified = 'Yes' AND msc >= ? AND msc < ?", (prefix, prefix + '\uffff')).fetchone()[0]
+
+    def exact(self, code):
+        return self.connection.execute("SELECT COUNT(*) FROM classifications WHERE verified = 'Yes' AND msc = ?", (code,)).fetchone()[0]
+
+def main():
+    parser = argparse.ArgumentParser(description='Load, clean and export the module catalog')
+    commands = parser.add_subparsers(dest='command', required=True)
+    load = commands.add_parser('load', help='bulk load itp_widget/src or all_data.zip')
+    load.add_argument('catalog')
+    load.add_argument('source')
+    load.add_argument('--classification', help='classification.csv exported from the widget')
+    dedupe = commands.add_parser('dedupe', help='keep one row per package in every library')
+    dedupe.add_argument('catalog')
+    export = commands.add_parser('export', help='write libraries.csv and library_data/ for the widget')
+    export.add_argument('catalog')
+    export.add_argument('directory')
+    args = parser.parse_args()
+
+    catalog = Catalog(args.catalog)
+    if args.command == 'load':
+        catalog.load_source(args.source)
+        if args.classification:
+            with open(args.classification, 'r', newline='') as f:
+                catalog.load_classification(csv.DictReader(f))
+        for code, in catalog.unknown_codes():
+            print('Warning: {} is not an MSC code'.format(code))
+    elif args.command == 'dedupe':
+        print('Removed {} duplicate rows'.format(catalog.deduplicate()))
+    elif args.command == 'export':
+        catalog.export(args.directory)
+    catalog.close()
+
+if __name__ == '__main__':
+    main()
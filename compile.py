@@ -1,12 +1,22 @@
 import chevron
-import re
-import itertools
-from zipfile import ZipFile
-import csv
+from chevron.tokenizer import tokenize
+import hashlib
+import os
+import pickle
+import heapq
 import datetime
 import typing
+import subprocess
 import sys
-import json
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+import bibliography
+import catalog
+import dataset
+import profiling
+import shards
+import snapshot
 now = datetime.datetime.now().strftime("%d %B %Y")
 nawazITPs = ['Isabelle', 'Coq', 'HOL', 'Agda', 'PVS', 'LEO-II', 'Watson', 'Yarrow', 'Atelier B', 'Metamath', 'Twelf', 'Mizar', 'RedPRL', 'JAPE', 'LEO-II', 'Getfol', 'Z/EVES']
 
@@ -19,34 +29,6 @@ outlierITPs.sort()
 def cited_list(items):
     return list_text(['{} [@{}]'.format(item, item.replace(" ","_")) for item in items])
 
-def partition(items, predicate):
-    return ([item for item in items if predicate(item)], [item for item in items if not predicate(item)])
-
-def package_counts(packages):
-    (unclassified, classified) = partition(packages, lambda x: x['MSC'] == '' or x['MSC'] == 'NA' or x['MSC'] == 'None' or x['MSC'] == '??-XX')
-    (verified, unverified) = partition(classified, lambda x: x['Verified'])
-    (excluded, not_excluded) = partition(verified, lambda x: x['MSC'].startswith('Exclude'))
-    (unsure, sure) = partition(not_excluded, lambda x: x['MSC'].lower().endswith("xx"))
-    (excludedDoc, notExcludedDoc) = partition(excluded, lambda x: x['MSC'] == 'Exclude-Doc')
-    (excludeUtil, notExcludedUtil) = partition(notExcludedDoc, lambda x: x['MSC'] == 'Exclude-Util')
-    (excludeNoDoc, notExcludedNoDoc) = partition(notExcludedUtil, lambda x: x['MSC'] == 'Exclude-Util')
-    (excludeDepr, _) = partition(notExcludedNoDoc, lambda x: x['MSC'] == 'Exclude-Depr')
-    return {
-        'total': len(packages),
-        'excluded': len(excluded),
-        'excluded-doc': len(excludedDoc),
-        'excluded-nodoc': len(excludeNoDoc),
-        'excluded-util': len(excludeUtil),
-        'excluded-depr': len(excludeDepr),
-        'verified': len(verified),
-        'unverified': len(unverified),
-        'unclassified': len(unclassified),
-        'incomplete': len(unclassified) + len(unverified) > 0,
-        'sure': len(sure),
-        'unsure': len(unsure),
-        'needs_pro': len(unsure) > 0
-        }
-
 def incompleteDetails(summary):
     if summary['incomplete']:
        start = 'The classification was not complete, as there was'
@@ -97,80 +79,142 @@ def list_text(items):
         return ", ".join(rest + [", and ".join(last_two)])
         
 
-data = {
-    'RQ1': 'What usability issues and solutions have been mentioned in literature regarding ITPs?',
-    'RQ2': 'To what extent to these usability issues exist at the latest versions of ITPs?',
-    'RQ3': 'What, if any, ITP should be used for a specific project?',
-    'nawazITPs': list_text(nawazITPs),
-    'addedITPs': list_text(addedITPs),
-    'ic2ExcludedLibraries': ic2ExcludedITPS,
-    'outlierITPs': list_text(outlierITPs),
-    'date': now
-}
-
-mscLookup = {}
-
-def removeBrackets(text):
-     no_brackets = re.sub(r"\[[^\[\]]+\]", "", text)
-     print(no_brackets)
-     no_braces = re.sub(r"\{[^\{\}]+\}", "", no_brackets)
-     return no_braces
-
-with ZipFile('results/all_data.zip', 'r') as all_data:
-    with all_data.open("msc.json", mode='r') as mscFile:
-        msc = json.load(mscFile)
-        for top_level in msc:
-            mscLookup[top_level['code']] = removeBrackets(top_level['short_name'])
-            for subclass in top_level['subclassifications']:
-                mscLookup[subclass['code']] = removeBrackets(subclass['name'])
-
-                for botclass in subclass['classifications']:
-                    mscLookup[botclass['code']] = removeBrackets(botclass['name'])
-
-            for botclass in top_level['classifications']:
-                mscLookup[botclass['code']] = removeBrackets(botclass['name'])
-                
-
-    with all_data.open("itps.csv", mode='r') as itpsFile:
-        itps = list(csv.DictReader([line.decode('utf8') for line in itpsFile.readlines()]))
-        itps.sort(key=lambda x: x['Name'])
-        data['itps'] = itps
-        data['itpNames'] = list_text([itp['Name'] for itp in itps])
-        data['citedItpNames'] = cited_list([itp['Name'] for itp in itps])
-        data['itpCount'] = len(data['itps'])
-        data['counterexampleITPs'] = [itp for itp in itps if itp['Counterexamples'] != 'No']
-        data['noCounterexampleITPs'] = [itp for itp in itps if itp['Counterexamples'] == 'No']
-
-        data['mathNotationITPs'] = [{ 'name': itp['Name'], 'description': itp['Math Notation Descriptions']} for itp in itps if itp['UTF8 Library'] == 'Yes']
-        data['noMathNotationITPs'] = list_text([itp['Name'] for itp in itps if itp['UTF8 Library'] == 'No'])
-
-
-    with all_data.open("counterExampleGenerators.csv", mode='r') as counterExampleGenerators:
-        generatorList = list(csv.DictReader([line.decode('utf8') for line in counterExampleGenerators.readlines()]))
-        generatorList.sort(key=lambda x: x['name'])
-        with all_data.open("counterExampleIntegrations.csv", mode='r') as counterExampleIntegrations:
-            integrations = list(csv.DictReader([line.decode('utf8') for line in counterExampleIntegrations.readlines()]))
-            generatorData = []
-            for generator in generatorList:
-                generatorData.append({
-                    'name': generator['name'],
-                    'description': generator['description'],
-                    'supports': list_text([integration['prover'] for integration in  integrations if integration['name'] == generator['name']]),
-                    'citation': "[{}]".format(";".join({"@{}".format(integration['citation']) for integration in integrations if integration['name'] == generator['name']}))
-                })
-            data['noCounterExampleITPS'] = list_text([itp['Name'] for itp in data['itps'] if itp['Name'] not in {integration['prover'] for integration in integrations}])
-            data['counterExampleGenerators'] = generatorData
-            data['counterExampleCount'] = len(generatorData)
-
-
-    with all_data.open("libraries.csv", mode='r') as libraries:
-        libraries = list(csv.DictReader([line.decode('utf8') for line in libraries.readlines()]))
-        libraries.sort(key=lambda x: x['name'])
-        data['libraries'] = libraries
-        data['libraryCount'] = len(data['libraries'])
-
-with open("results/library_stats.csv", "r") as libstats:
-    libstats = list(csv.DictReader(libstats))
+def base_data():
+    return {
+        'RQ1': 'What usability issues and solutions have been mentioned in literature regarding ITPs?',
+        'RQ2': 'To what extent to these usability issues exist at the latest versions of ITPs?',
+        'RQ3': 'What, if any, ITP should be used for a specific project?',
+        'nawazITPs': list_text(nawazITPs),
+        'addedITPs': list_text(addedITPs),
+        'ic2ExcludedLibraries': ic2ExcludedITPS,
+        'outlierITPs': list_text(outlierITPs),
+        'date': now
+    }
+
+def top_k(counts, n):
+    # The n largest counts, ties going to the smallest key
+    return heapq.nsmallest(n, counts.items(), key=lambda x: (-x[1], x[0]))
+
+def countsToText(counts):
+    if 'prover' in counts[0]:
+        return list_text(['*{}* with {} modules'.format(x['prover'], x['count']) for x in counts])
+    else:
+        return list_text(['*{}* ({}) with {} modules'.format(x['name'], x['msc'], x['count']) for x in counts])
+
+
+comments =  { 
+     '68-XX': 'Computer Science was clearly the most popular category, mainly because ITPs like ACL2, Isabelle, HOL4 and Coq are all mainly built for the purpose of verifying software. There was a large amount of data structures of all kinds created to reason about programs. Even Mizar, a usually mathematical ITP, has several modules dedicated to the verification of software.'
+   , '03-XX': 'Mathematical Logic and Foundations was common because often ITPs would start developing their libraries through laying the foundations. However, some ITPs such as Mizar have large amounts of contributions on topics such as fuzzy logic, which does not neccesarily make up its foundation but is still within this category.'
+   , '11-XX': 'Number Theory consistently had a large amount of modules from most ITPs. Elementary Number theory made up the majority of this category, mainly modular arithmetic, distribution of primes and primality checking.'
+   , '26-XX': 'Real Functions covers topics often considered to be part of real analysis. This classification has a strong presence in Mizar, where a large amount of real analysis is covered. But also HOL Light, which sports a strong multivariate library.'
+   , '54-XX': 'Topology made up a large amount of modules. Mizar definitely dominated this space, and discusses topology widely.'
+   , '06-XX': 'Orders was covered widely, mainly in discussion with lattices. Mizar has a large amount of modules dedicated to formalising continuous lattices, which are then used in the context of Domain Theory.'
+   , '05-XX': 'There were a large amount of combinatorics modules, mainly from graph theory. Isabelle here has the most packages, using graph theory mainly for the purpose of verifying graph algorithms.'
+   , '18-XX': 'Category theory is often in the context of functional programming and controlling effects. Haskell has popularized the use of monads for controlling effects. ITPs such as Lean reimplement those concepts in their ITPs.'
+   , '13-XX': 'Discussion of Commutative Algebra was mainly restricted to ITPs interested in proving math theorems, such as Mizar or Lean. Lean has a top level module entirely on ring theory.'
+   , '51-XX': 'Geometry was common among most theroem provers, with Mizar having a large amount of module about Affine Geometry.'
+   , '15-XX':  'Linear Algebra was implemented in several ITPs, mainly used for the purpose of setting up vector spaces.'
+   }
+
+
+# Each section of the data computes a few of the keys the template uses. A
+# section is only computed once the template asks for one of its keys.
+sections = {}
+
+def section(*keys):
+    def decorator(compute):
+        for key in keys:
+            sections[key] = compute
+        return compute
+    return decorator
+
+class LazyData:
+    def __init__(self, sources=None, packages=None):
+        self._sources = sources
+        # A catalog can stand in for classification.csv, it answers the same queries
+        self._packages = packages
+        self.values = base_data()
+        self.pending = dict(sections)
+
+    @property
+    def sources(self):
+        if self._sources is None:
+            self._sources = snapshot.current()
+        return self._sources
+
+    @property
+    def packages(self):
+        if self._packages is None:
+            self._packages = self.sources.packages
+        return self._packages
+
+    def __getitem__(self, key):
+        if key not in self.values and key in self.pending:
+            compute = self.pending[key]
+            try:
+                with profiling.stage('data:' + compute.__name__):
+                    compute(self)
+            except Exception as e:
+                # chevron renders a key as '' when looking it up raises
+                # KeyError, ValueError, IndexError or AttributeError, which
+                # would hide the failure
+                raise RuntimeError('Computing {} for {} failed'.format(compute.__name__, key)) from e
+            # Only dropped once computed, so a failed section is tried again
+            self.pending = {other: pending for other, pending in self.pending.items() if pending is not compute}
+        return self.values[key]
+
+    def __setitem__(self, key, value):
+        self.values[key] = value
+
+    def __contains__(self, key):
+        return key in self.values or key in self.pending
+
+    def resolve(self):
+        for key in list(self.pending):
+            self[key]
+        return self.values
+
+@section('itps', 'itpNames', 'citedItpNames', 'itpCount', 'counterexampleITPs', 'noCounterexampleITPs', 'mathNotationITPs', 'noMathNotationITPs')
+def itp_data(data):
+    itps = list(data.sources.tables['itps'])
+    itps.sort(key=lambda x: x['Name'])
+    data['itps'] = itps
+    data['itpNames'] = list_text([itp['Name'] for itp in itps])
+    data['citedItpNames'] = cited_list([itp['Name'] for itp in itps])
+    data['itpCount'] = len(data['itps'])
+    data['counterexampleITPs'] = [itp for itp in itps if itp['Counterexamples'] != 'No']
+    data['noCounterexampleITPs'] = [itp for itp in itps if itp['Counterexamples'] == 'No']
+
+    data['mathNotationITPs'] = [{ 'name': itp['Name'], 'description': itp['Math Notation Descriptions']} for itp in itps if itp['UTF8 Library'] == 'Yes']
+    data['noMathNotationITPs'] = list_text([itp['Name'] for itp in itps if itp['UTF8 Library'] == 'No'])
+
+@section('noCounterExampleITPS', 'counterExampleGenerators', 'counterExampleCount')
+def counterexample_data(data):
+    generatorList = list(data.sources.tables['generators'])
+    generatorList.sort(key=lambda x: x['name'])
+    integrations = data.sources.tables['integrations']
+    generatorData = []
+    for generator in generatorList:
+        generatorData.append({
+            'name': generator['name'],
+            'description': generator['description'],
+            'supports': list_text([integration['prover'] for integration in  integrations if integration['name'] == generator['name']]),
+            'citation': "[{}]".format(";".join({"@{}".format(integration['citation']) for integration in integrations if integration['name'] == generator['name']}))
+        })
+    data['noCounterExampleITPS'] = list_text([itp['Name'] for itp in data['itps'] if itp['Name'] not in {integration['prover'] for integration in integrations}])
+    data['counterExampleGenerators'] = generatorData
+    data['counterExampleCount'] = len(generatorData)
+
+@section('libraries', 'libraryCount')
+def library_data(data):
+    libraries = list(data.sources.tables['libraries'])
+    libraries.sort(key=lambda x: x['name'])
+    data['libraries'] = libraries
+    data['libraryCount'] = len(data['libraries'])
+
+@section('libstats', 'totalPackageCount', 'clasifiedPackageCount', 'verifiedPackageCount', 'unVerifiedPackageCount', 'classificationIncomplete', 'leanPackageCount', 'mizarPackageCount')
+def libstats_data(data):
+    libstats = list(data.sources.tables['libstats'])
     libstats.sort(key=lambda x: x['ITP'])
     data['libstats'] =libstats
     data['totalPackageCount'] = sum([int(line['Total']) for line in data['libstats']])
@@ -184,21 +228,24 @@ with open("results/library_stats.csv", "r") as libstats:
 
     data['mizarPackageCount'] = sum([int(line['Total']) for line in data['libstats'] if line['ITP'] == 'Mizar'])
 
-with open("results/classification.csv", "r") as classification:
-    packages = list(csv.DictReader(classification))
-    verifiedPackages = [package for package in packages if package['Verified'] == 'Yes']
-    data['totalCompSciModules'] = len([package for package in verifiedPackages if package['MSC'].startswith('68')])
-    data['totalAutomataModules'] = len([package for package in verifiedPackages if package['MSC'].startswith('68Q45')])
-    data['totalTheoryOfData'] = len([package for package in verifiedPackages if package['MSC'].startswith('68P')])
-    data['totalLogicModules'] = len([package for package in verifiedPackages if package['MSC'].startswith('03')])
-    data['totalProgrammingLanguageModules'] = len([package for package in verifiedPackages if package['MSC'] == "68N15"])
-    data['totalDataStructuresModules'] = len([package for package in verifiedPackages if package['MSC'] == "68P05"])
-    data['totalProcessorModules'] = len([package for package in verifiedPackages if package['MSC'] == "68N20"])
-
+@section('totalCompSciModules', 'totalAutomataModules', 'totalTheoryOfData', 'totalLogicModules', 'totalProgrammingLanguageModules', 'totalDataStructuresModules', 'totalProcessorModules')
+def module_totals(data):
+    verifiedCodes = data.packages.verified_codes()
+    data['totalCompSciModules'] = verifiedCodes.prefix('68')
+    data['totalAutomataModules'] = verifiedCodes.prefix('68Q45')
+    data['totalTheoryOfData'] = verifiedCodes.prefix('68P')
+    data['totalLogicModules'] = verifiedCodes.prefix('03')
+    data['totalProgrammingLanguageModules'] = verifiedCodes.exact("68N15")
+    data['totalDataStructuresModules'] = verifiedCodes.exact("68P05")
+    data['totalProcessorModules'] = verifiedCodes.exact("68N20")
+
+@section('itp_summaries')
+def summary_data(data):
     summary_stats = []
 
+    library_counts = data.packages.library_counts()
     for library in data['libraries']:
-        summary = package_counts([package for package in packages if package['ITP'] == library['name'] and package['Library'] == library['section']])
+        summary = dict(library_counts.get((library['name'], library['section'])) or dataset.finish_counts(dataset.empty_counts()))
         summary['ITP'] = library['name']
         summary['Library'] = library['section']
         summary['ExcludedDetails'] = excludedDetails(summary)
@@ -208,45 +255,19 @@ with open("results/classification.csv", "r") as classification:
 
     data['itp_summaries'] = summary_stats
 
-    def get_top(packages, n, key):
-        packages.sort(key=key)
-        grouped = [(x, [z for z in y]) for x, y in itertools.groupby(packages, key = key)]
-        grouped.sort(key=lambda x: -len(x[1]))
-        return grouped[:n]
-
-    def countsToText(counts):
-        if 'prover' in counts[0]:
-            return list_text(['*{}* with {} modules'.format(x['prover'], x['count']) for x in counts])
-        else:
-            return list_text(['*{}* ({}) with {} modules'.format(x['name'], x['msc'], x['count']) for x in counts])
-
-
+@section('top_classifications')
+def classification_data(data):
+    mscLookup = data.sources.msc
     top_classifications = []
 
-    comments =  { 
-         '68-XX': 'Computer Science was clearly the most popular category, mainly because ITPs like ACL2, Isabelle, HOL4 and Coq are all mainly built for the purpose of verifying software. There was a large amount of data structures of all kinds created to reason about programs. Even Mizar, a usually mathematical ITP, has several modules dedicated to the verification of software.'
-       , '03-XX': 'Mathematical Logic and Foundations was common because often ITPs would start developing their libraries through laying the foundations. However, some ITPs such as Mizar have large amounts of contributions on topics such as fuzzy logic, which does not neccesarily make up its foundation but is still within this category.'
-       , '11-XX': 'Number Theory consistently had a large amount of modules from most ITPs. Elementary Number theory made up the majority of this category, mainly modular arithmetic, distribution of primes and primality checking.'
-       , '26-XX': 'Real Functions covers topics often considered to be part of real analysis. This classification has a strong presence in Mizar, where a large amount of real analysis is covered. But also HOL Light, which sports a strong multivariate library.'
-       , '54-XX': 'Topology made up a large amount of modules. Mizar definitely dominated this space, and discusses topology widely.'
-       , '06-XX': 'Orders was covered widely, mainly in discussion with lattices. Mizar has a large amount of modules dedicated to formalising continuous lattices, which are then used in the context of Domain Theory.'
-       , '05-XX': 'There were a large amount of combinatorics modules, mainly from graph theory. Isabelle here has the most packages, using graph theory mainly for the purpose of verifying graph algorithms.'
-       , '18-XX': 'Category theory is often in the context of functional programming and controlling effects. Haskell has popularized the use of monads for controlling effects. ITPs such as Lean reimplement those concepts in their ITPs.'
-       , '13-XX': 'Discussion of Commutative Algebra was mainly restricted to ITPs interested in proving math theorems, such as Mizar or Lean. Lean has a top level module entirely on ring theory.'
-       , '51-XX': 'Geometry was common among most theroem provers, with Mizar having a large amount of module about Affine Geometry.'
-       , '15-XX':  'Linear Algebra was implemented in several ITPs, mainly used for the purpose of setting up vector spaces.'
-       }
-
-
     # Top 15 categories
-    not_excluded = [package for package in packages if not package['MSC'].startswith('Exclude') and not package['MSC'] == '']
-    for classification, cat_iter in get_top(not_excluded, 10, lambda x: x['MSC'][:2]):
-        cat_packages = list(cat_iter)
-        total_packages = len(cat_packages)
+    categories = data.packages.category_counts()
+    for classification, total_packages in top_k({top: category['total'] for top, category in categories.items()}, 10):
+        category = categories[classification]
         code = classification + "-XX"
-        top_mid_categories = [{'msc': msc + 'xx', 'count': len(modules), 'name': mscLookup[msc + 'xx']} for msc, modules in get_top(cat_packages,3,lambda x: x['MSC'][:3]) if msc + 'xx' in mscLookup]
-        top_low_categories = [{'msc': msc, 'count': len(modules), 'name': mscLookup[msc]} for msc, modules in get_top(cat_packages,2,lambda x: x['MSC']) if msc in mscLookup]
-        top_provers = [{'prover': prover, 'count': len(modules)} for prover, modules in get_top(cat_packages,3,lambda x: x['ITP'])]
+        top_mid_categories = [{'msc': msc + 'xx', 'count': count, 'name': mscLookup[msc + 'xx']} for msc, count in top_k(category['mid'], 3) if msc + 'xx' in mscLookup]
+        top_low_categories = [{'msc': msc, 'count': count, 'name': mscLookup[msc]} for msc, count in top_k(category['low'], 2) if msc in mscLookup]
+        top_provers = [{'prover': prover, 'count': count} for prover, count in top_k(category['provers'], 3)]
         top_classifications.append({
             'msc': code,
             'name': mscLookup[code],
@@ -258,19 +279,107 @@ with open("results/classification.csv", "r") as classification:
             })
     data['top_classifications'] = top_classifications
 
+def load_data(sources=None, packages=None):
+    # Every section at once, as a plain dict that can be pickled
+    return LazyData(sources, packages).resolve()
 
-
-if sys.argv[1] == 'html':
-    with open('index.md', 'r') as f:
+@profiling.stage('template')
+def template_tokens(path='index.md', cache_dir='.build_cache'):
+    # index.md tokenized by chevron, cached by a hash of its contents
+    with open(path, 'r') as f:
         contents = f.read()
-        data['html'] = True
-        result = chevron.render(contents, data)
-        with open("build.html.md", "w") as out:
-            out.write(result)
-elif sys.argv[1] == 'latex':
-    with open('index.md', 'r') as f:
-        contents = f.read()
-        data['latex'] = True
-        result = chevron.render(contents, data)
-        with open("build.tex.md", "w") as out:
-            out.write(result)
+    cached = os.path.join(cache_dir, 'template-{}.pickle'.format(hashlib.sha256(contents.encode('utf8')).hexdigest()))
+    if os.path.exists(cached):
+        with open(cached, 'rb') as f:
+            return pickle.load(f)
+    tokens = list(tokenize(contents))
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(cached, 'wb') as f:
+        pickle.dump(tokens, f)
+    return tokens
+
+targets = {
+    'html': 'build.html.md',
+    'latex': 'build.tex.md'
+}
+
+pandoc_args = {
+    'html': ['--from', 'markdown+pipe_tables', '--template', 'mytemplate.md', '--toc', '-F', 'pandoc-csv2table', '-F', 'pandoc-crossref', '--no-highlight', '--mathjax', '-C'],
+    'latex': ['--from', 'markdown+pipe_tables', '--template', 'mytemplate.tex', '--toc', '-F', 'pandoc-csv2table', '-F', 'pandoc-crossref', '--mathjax', '--listings', '-C', '--bibliography', 'References.bib']
+}
+templates = {
+    'html': 'mytemplate.md',
+    'latex': 'mytemplate.tex'
+}
+outputs = {
+    'html': 'index.html',
+    'latex': 'index.pdf'
+}
+
+def render(data, target):
+    # data is either a dict or a LazyData, the target flag is looked up first
+    with profiling.stage('render', target=target):
+        return chevron.render(template_tokens(), scopes=[{target: True}, data])
+
+def run_pandoc(target, pruned):
+    # The chapter by chapter run of shards.py, pruned is a bibliography holding
+    # just the entries the target cites
+    start = time.perf_counter()
+    with profiling.stage('pandoc', target=target):
+        try:
+            shards.run(bibliography.with_bibliography(pandoc_args[target], pruned), targets[target], outputs[target])
+            returncode, log = 0, ''
+        except subprocess.CalledProcessError as error:
+            returncode, log = error.returncode, error.stderr
+    return returncode, log, time.perf_counter() - start
+
+def build_all(data, workers=None):
+    # Renders every target from the one copy of the data, then runs pandoc on
+    # all of them at once. A failing target does not stop the others.
+    results = {target: {'render': 0.0, 'pandoc': 0.0, 'error': None} for target in targets}
+    for target in targets:
+        start = time.perf_counter()
+        try:
+            with open(targets[target], "w") as out:
+                out.write(render(data, target))
+            results[target]['bibliography'] = bibliography.prune(targets[target])
+        except Exception:
+            results[target]['error'] = traceback.format_exc()
+        results[target]['render'] = time.perf_counter() - start
+
+    rendered = [target for target in targets if results[target]['error'] is None]
+    # The pandoc processes are timed together here, their stages run in the
+    # pool and only see their own thread
+    with profiling.stage('pandoc:all'), ThreadPoolExecutor(max_workers=workers or len(rendered) or 1) as pool:
+        runs = {target: pool.submit(run_pandoc, target, results[target]['bibliography']) for target in rendered}
+        for target, run in runs.items():
+            try:
+                returncode, log, results[target]['pandoc'] = run.result()
+                if returncode != 0:
+                    results[target]['error'] = 'pandoc exited with {}\n{}'.format(returncode, log)
+            except OSError:
+                results[target]['error'] = traceback.format_exc()
+
+    print('{:<8}{:>10}{:>10}  {}'.format('target', 'render', 'pandoc', 'output'))
+    for target, result in results.items():
+        print('{:<8}{:>10.2f}{:>10.2f}  {}'.format(target, result['render'], result['pandoc'], 'failed' if result['error'] else outputs[target]))
+    for target, result in results.items():
+        if result['error']:
+            print()
+            print('{} failed:'.format(target))
+            print(result['error'])
+    return [target for target, result in results.items() if result['error']]
+
+if __name__ == '__main__':
+    profiling.start()
+    # python compile.py html|latex|all [catalog.sqlite]
+    data = LazyData(packages=catalog.Catalog(sys.argv[2]) if len(sys.argv) > 2 else None)
+    if sys.argv[1] == 'all':
+        start = time.perf_counter()
+        data.resolve()
+        print('Loaded data in {:.2f}s'.format(time.perf_counter() - start))
+        if build_all(data):
+            raise SystemExit(1)
+    elif sys.argv[1] in targets:
+        with open(targets[sys.argv[1]], "w") as out:
+            out.write(render(data, sys.argv[1]))
@@ -0,0 +1,182 @@
+import array
+import collections
+import csv
+import hashlib
+import os
+import numpy as np
+import msc_index
+import profiling
+
+# classification.csv held column by column. ITP, Library and MSC are stored
+# as small integer codes into a table of their distinct values, and Verified
+# as two booleans, so a row costs a few bytes rather than a dict of strings.
+# Every summary statistic is a mask over the rows and a bincount. The columns
+# are saved to the build cache, keyed by a hash of the CSV, so the CSV only
+# has to be parsed when it changes.
+categorical = ['ITP', 'Library', 'MSC']
+
+# Exclusion criteria counted individually in the library summaries. Exclude-NoDoc
+# is left out on purpose, the summaries have never counted it separately.
+exclusion_counters = {
+    'Exclude-Doc': 'excluded-doc',
+    'Exclude-Util': 'excluded-util',
+    'Exclude-Depr': 'excluded-depr'
+}
+
+unclassified_codes = ['', 'NA', 'None', '??-XX']
+
+def empty_counts():
+    return {
+        'total': 0,
+        'excluded': 0,
+        'excluded-doc': 0,
+        'excluded-nodoc': 0,
+        'excluded-util': 0,
+        'excluded-depr': 0,
+        'verified': 0,
+        'unverified': 0,
+        'unclassified': 0,
+        'incomplete': False,
+        'sure': 0,
+        'unsure': 0,
+        'needs_pro': False
+        }
+
+def finish_counts(counts):
+    counts['incomplete'] = counts['unclassified'] + counts['unverified'] > 0
+    counts['needs_pro'] = counts['unsure'] > 0
+    return counts
+
+def names_array(names):
+    # An empty list would otherwise become a float array
+    return np.array(names, dtype=str) if names else np.array([], dtype='<U1')
+
+class Packages:
+    def __init__(self, columns):
+        self.itp_names = columns['itp_names']
+        self.library_names = columns['library_names']
+        self.msc_names = columns['msc_names']
+        self.itp = columns['itp']
+        self.library = columns['library']
+        self.msc = columns['msc']
+        # verified is Verified == 'Yes', reviewed is any Verified value at all.
+        # The library summaries count a module as verified when it has been
+        # reviewed, the totals in the text only count the ones marked Yes.
+        self.verified = columns['verified']
+        self.reviewed = columns['reviewed']
+
+    @classmethod
+    def from_csv(cls, path):
+        tables = {column: {} for column in categorical}
+        codes = {column: array.array('i') for column in categorical}
+        verified = bytearray()
+        reviewed = bytearray()
+        with open(path, "r", newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            positions = [(header.index(column), tables[column], codes[column]) for column in categorical]
+            verified_position = header.index('Verified')
+            for line in reader:
+                # Blank lines are skipped and short rows padded with None, as
+                # DictReader did. A missing Verified counts as reviewed but not
+                # verified, and numpy keeps a missing category as 'None'.
+                if not line:
+                    continue
+                if len(line) < len(header):
+                    line += [None] * (len(header) - len(line))
+                for position, table, column_codes in positions:
+                    column_codes.append(table.setdefault(line[position], len(table)))
+                verified.append(line[verified_position] == 'Yes')
+                reviewed.append(line[verified_position] != '')
+        columns = {}
+        for column in categorical:
+            name = column.lower()
+            columns[name + '_names'] = names_array(list(tables[column]))
+            columns[name] = np.frombuffer(codes[column], dtype=np.int32).copy()
+        columns['verified'] = np.frombuffer(bytes(verified), dtype=np.bool_).copy()
+        columns['reviewed'] = np.frombuffer(bytes(reviewed), dtype=np.bool_).copy()
+        return cls(columns)
+
+    def save(self, path):
+        np.savez(path, **vars(self))
+
+    def __len__(self):
+        return len(self.msc)
+
+    def code_counts(self, mask):
+        # Number of rows under mask for every distinct MSC code
+        return np.bincount(self.msc[mask], minlength=len(self.msc_names))
+
+    def verified_codes(self):
+        counts = self.code_counts(self.verified)
+        return msc_index.CodeCounts({code: int(count) for code, count in zip(self.msc_names.tolist(), counts) if count})
+
+    def library_counts(self):
+        # The summary counts for every (ITP, Library) that has packages
+        if len(self) == 0:
+            return {}
+        is_unclassified = np.isin(self.msc_names, unclassified_codes)[self.msc]
+        is_excluded = np.char.startswith(self.msc_names, 'Exclude')[self.msc]
+        is_unsure = np.char.endswith(np.char.lower(self.msc_names), 'xx')[self.msc]
+
+        verified = ~is_unclassified & self.reviewed
+        excluded = verified & is_excluded
+        masks = {
+            'unclassified': is_unclassified,
+            'unverified': ~is_unclassified & ~self.reviewed,
+            'verified': verified,
+            'excluded': excluded,
+            'unsure': verified & ~is_excluded & is_unsure,
+            'sure': verified & ~is_excluded & ~is_unsure
+        }
+        for code, counter in exclusion_counters.items():
+            masks[counter] = excluded & (self.msc_names == code)[self.msc]
+
+        groups, group = np.unique(self.itp.astype(np.int64) * len(self.library_names) + self.library, return_inverse=True)
+        totals = {name: np.bincount(group, weights=mask, minlength=len(groups)) for name, mask in masks.items()}
+        totals['total'] = np.bincount(group, minlength=len(groups))
+
+        counts = {}
+        for i, key in enumerate(groups.tolist()):
+            itp, library = divmod(key, len(self.library_names))
+            summary = empty_counts()
+            for name, values in totals.items():
+                summary[name] = int(values[i])
+            counts[(str(self.itp_names[itp]), str(self.library_names[library]))] = finish_counts(summary)
+        return counts
+
+    def category_counts(self):
+        # Counts every classified package against its top level category, and
+        # within that its mid level code, its full code and its ITP
+        names = self.msc_names
+        classified = (~np.char.startswith(names, 'Exclude') & (names != ''))[self.msc]
+        per_code = self.code_counts(classified)
+        per_prover = np.bincount(self.msc[classified].astype(np.int64) * len(self.itp_names) + self.itp[classified], minlength=len(names) * len(self.itp_names)).reshape(len(names), len(self.itp_names))
+
+        counts = {}
+        for i in np.flatnonzero(per_code).tolist():
+            msc = str(names[i])
+            top = msc[:2]
+            if top not in counts:
+                counts[top] = {'total': 0, 'mid': collections.Counter(), 'low': collections.Counter(), 'provers': collections.Counter()}
+            category = counts[top]
+            count = int(per_code[i])
+            category['total'] += count
+            category['mid'][msc[:3]] += count
+            category['low'][msc] += count
+            for itp in np.flatnonzero(per_prover[i]).tolist():
+                category['provers'][str(self.itp_names[itp])] += int(per_prover[i, itp])
+        return counts
+
+@profiling.stage('classification')
+def load(path, cache_dir='.build_cache'):
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    cached = os.path.join(cache_dir, 'classification-{}.npz'.format(digest))
+    if os.path.exists(cached):
+        with np.load(cached) as columns:
+            return Packages(dict(columns))
+    packages = Packages.from_csv(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    packages.save(cached)
+    return packages
@@ -0,0 +1,62 @@
+import csv
+import gzip
+import json
+import os
+import sys
+import time
+import searchIndex
+
+# Compares searching modules through searchIndex.py's index against scanning
+# every module, at the size of the widget's libraries today (5k modules) and at
+# 100k. The larger set repeats the real modules, numbering the copies so each
+# is its own module. The scan is given every module's terms already lowercased
+# and joined, as a client would prepare them once, and has to find exactly the
+# same modules as the index. Pass a number to change the repeat count.
+source_dir = 'src'
+sizes = [5000, 100000]
+queries = ['group', 'topolog', 'real anal', 'prime number', 'lemma', 'cat', 'hilbert space', 'matrix det', 'zorn', 'set theory axiom']
+
+def modules():
+    rows = []
+    with open(os.path.join(source_dir, 'libraries.csv'), 'r', newline='') as f:
+        for library in csv.DictReader(f):
+            with open(os.path.join(source_dir, 'library_data', library['file']), 'r', newline='') as data:
+                rows.extend(csv.DictReader(data))
+    return rows
+
+def sample(rows, size):
+    return [rows[i] if i < len(rows) else dict(rows[i % len(rows)], package='{} {}'.format(rows[i % len(rows)]['package'], i // len(rows))) for i in range(size)]
+
+def scan(haystacks, query):
+    words = [' ' + word for word in searchIndex.words(query)]
+    if not words:
+        return []
+    return [position for position, haystack in enumerate(haystacks) if all(word in haystack for word in words)]
+
+def per_query(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            function(query)
+    return (time.perf_counter() - start) / repeat / len(queries)
+
+def main(repeat):
+    rows = modules()
+    print('{:<10}{:>10}{:>12}{:>10}{:>12}{:>12}{:>10}'.format('modules', 'terms', 'index KiB', 'build s', 'scan ms', 'index ms', 'speedup'))
+    for size in sizes:
+        sampled = sample(rows, size)
+        start = time.perf_counter()
+        index = searchIndex.build(sampled)
+        build_time = time.perf_counter() - start
+        compressed = len(gzip.compress(json.dumps(index, separators=(',', ':')).encode('utf8')))
+        haystacks = [' ' + ' '.join(searchIndex.module_tokens(row)) + ' ' for row in sampled]
+        for query in queries:
+            if searchIndex.search(index, query) != scan(haystacks, query):
+                raise AssertionError('Index and scan disagree on {!r}'.format(query))
+        scan_time = per_query(lambda query: scan(haystacks, query), repeat)
+        index_time = per_query(lambda query: searchIndex.search(index, query), repeat)
+        print('{:<10}{:>10}{:>12.0f}{:>10.2f}{:>12.3f}{:>12.3f}{:>9.1f}x'.format(
+            size, len(index['terms']), compressed / 1024, build_time, scan_time * 1000, index_time * 1000, scan_time / index_time))
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,171 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+import re
+import sys
+import searchIndex
+
+# The libraries for the widget, packed so that it only downloads what it shows.
+# Every row of libraries.csv gets a gzipped JSON shard of its entries, and a
+# separate shard of their descriptions, which are most of the size (AFP's
+# abstracts especially) and only needed once a package is opened. A manifest
+# lists the shards with the size and summary statistics of each library,
+# enough for the overview of every prover without loading any shard.
+#
+# Each ITP also gets a shard of searchIndex.py's index over its modules, which
+# are numbered through its libraries in the order of the manifest. Excluded
+# modules are not indexed.
+#
+# Entries are stored a column at a time. Every string in a shard is stored once
+# in its string table and referred to by its position, and MSC codes are
+# positions in its table of codes.
+#
+#   python bundleData.py [output directory]
+source_dir = 'src'
+output = os.path.join(source_dir, 'library_bundle')
+# Bumped whenever the layout of the bundle changes
+version = 4
+
+entry_fields = {
+    'name': 'package',
+    'authors': 'authors',
+    'category': 'category',
+    'url': 'url'
+}
+
+class Table:
+    # Positions of values in a list of them, in the order they were first seen
+    def __init__(self):
+        self.positions = {}
+        self.values = []
+
+    def __call__(self, value):
+        if value not in self.positions:
+            self.positions[value] = len(self.values)
+            self.values.append(value)
+        return self.positions[value]
+
+# The same as packageIsExcluded and packageIsUnclassified in Classification.elm
+def is_excluded(code):
+    return code.startswith('Exclude')
+
+def is_unclassified(code):
+    return code in ('None', 'NA', '')
+
+def summary(rows):
+    included = [row for row in rows if not is_excluded(row['msc'])]
+    # Verified and classified modules, unsure when only the top of the code is
+    # known (11-XX), as counted by the overview chart in Main.elm
+    classified = [row for row in included if row['verified'] == 'True' and not is_unclassified(row['msc'])]
+    unsure = sum(1 for row in classified if row['msc'].lower().endswith('xx'))
+    topics = {}
+    for row in included:
+        if not is_unclassified(row['msc']):
+            topic = row['msc'][:2] + '-XX'
+            topics[topic] = topics.get(topic, 0) + 1
+    return {
+        'modules': len(included),
+        'verified': sum(1 for row in included if row['verified'] == 'True'),
+        'excluded': len(rows) - len(included),
+        'unclassified': sum(1 for row in included if is_unclassified(row['msc'])),
+        'sure': len(classified) - unsure,
+        'unsure': unsure,
+        'authors': len({row['authors'] for row in included if row.get('authors')}),
+        'topics': dict(sorted(topics.items()))
+    }
+
+def entries_shard(rows):
+    strings = Table()
+    codes = Table()
+    entries = {field: [strings(row.get(column, '')) for row in rows] for field, column in entry_fields.items()}
+    entries['msc'] = [codes(row['msc']) for row in rows]
+    entries['verified'] = [1 if row['verified'] == 'True' else 0 for row in rows]
+    return {'version': version, 'strings': strings.values, 'codes': codes.values, 'entries': entries}
+
+def descriptions_shard(rows):
+    return {'version': version, 'descriptions': [row['description'] for row in rows]}
+
+def search_shard(itp, libraries, rows):
+    # Excluded modules are not shown anywhere else, so they are left out of the
+    # index. They keep their positions, as empty modules, so the positions
+    # still match the entry shards.
+    index = searchIndex.build([{} if is_excluded(row['msc']) else row for library in rows for row in library])
+    return {
+        'version': version,
+        'itp': itp,
+        'libraries': [{'section': library['section'], 'modules': len(library_rows)} for library, library_rows in zip(libraries, rows)],
+        'terms': index['terms'],
+        'postings': index['postings']
+    }
+
+def write_gzip(data, path):
+    encoded = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf8')
+    # mtime is left out so the same data always gives the same file
+    with open(path, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=9, mtime=0) as f:
+            f.write(encoded)
+    return os.path.getsize(path)
+
+def write(directory=output):
+    # Written next to the old bundle and swapped in, so a shard that no longer
+    # exists doesn't linger
+    partial = directory + '.partial'
+    shutil.rmtree(partial, ignore_errors=True)
+    os.makedirs(partial)
+    libraries = []
+    itp_rows = {}
+    with open(os.path.join(source_dir, 'libraries.csv'), 'r', newline='') as f:
+        for library in csv.DictReader(f):
+            with open(os.path.join(source_dir, 'library_data', library['file']), 'r', newline='') as data:
+                rows = list(csv.DictReader(data))
+            itp_rows.setdefault(library['name'], []).append(rows)
+            shard = os.path.splitext(library['file'])[0]
+            libraries.append({
+                'itp': library['name'],
+                'section': library['section'],
+                'file': library['file'],
+                'url': library['url'],
+                'entries': shard + '.json.gz',
+                'descriptions': shard + '-descriptions.json.gz',
+                'bytes': {
+                    'entries': write_gzip(entries_shard(rows), os.path.join(partial, shard + '.json.gz')),
+                    'descriptions': write_gzip(descriptions_shard(rows), os.path.join(partial, shard + '-descriptions.json.gz'))
+                },
+                'summary': summary(rows)
+            })
+    search = []
+    for itp, rows in itp_rows.items():
+        shard = 'search-{}.json.gz'.format(re.sub(r'[^a-z0-9]+', '-', itp.lower()))
+        data = search_shard(itp, [library for library in libraries if library['itp'] == itp], rows)
+        search.append({
+            'itp': itp,
+            'index': shard,
+            'terms': len(data['terms']),
+            'bytes': write_gzip(data, os.path.join(partial, shard))
+        })
+    manifest = {
+        'version': version,
+        'modules': sum(library['summary']['modules'] for library in libraries),
+        'verified': sum(library['summary']['verified'] for library in libraries),
+        'libraries': libraries,
+        'search': search
+    }
+    with open(os.path.join(partial, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(partial, directory)
+    return manifest
+
+if __name__ == '__main__':
+    directory = sys.argv[1] if len(sys.argv) > 1 else output
+    manifest = write(directory)
+    libraries = manifest['libraries']
+    print('Wrote {} libraries and {} modules to {} (entries {} bytes, descriptions {} bytes, search {} bytes)'.format(
+        len(libraries),
+        manifest['modules'],
+        directory,
+        sum(library['bytes']['entries'] for library in libraries),
+        sum(library['bytes']['descriptions'] for library in libraries),
+        sum(index['bytes'] for index in manifest['search'])))
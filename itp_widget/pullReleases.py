@@ -1,16 +1,27 @@
-from github import Github
-from github.Repository import Repository
 import os
+import json
 import requests
 from bs4 import BeautifulSoup
 import csv
 import re
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 
-# First create a Github instance:
+# The latest release of every ITP. The GitHub repositories are all asked for
+# in batched GraphQL queries rather than a handful of REST calls each, and the
+# pages of the ITPs that are not on GitHub are fetched at the same time.
+# Every GitHub tag is kept in itp_release_history.csv, and later runs only
+# ask for the tags newer than those.
+#
+#   GITHUB_TOKEN=... python pullReleases.py
+#
+# GITHUB_GRAPHQL_URL points the GitHub queries somewhere else, such as a local
+# mock server.
+graphql_url = os.environ.get('GITHUB_GRAPHQL_URL', 'https://api.github.com/graphql')
+# Repositories asked for in a single query
+batch_size = 20
 
-# using an access token
-g = Github(os.environ['GITHUB_TOKEN'])
+fieldnames = ["name", "latest_release_date", "latest_release_name", "url", "release_url"]
 
 remotes = [{
     "name": "ACL2",
@@ -18,6 +29,8 @@ remotes = [{
     },{
     "name": "Isabelle",
     "repo": "seL4/isabelle",
+    # Development snapshots and release candidates are tagged too
+    "release": r"^Isabelle\d{4}(-\d+)?$"
     },{
     "name": "Metamath",
     "repo": "metamath/metamath-exe",
@@ -62,90 +75,214 @@ remotes = [{
     "repo": "getfol/GETFOL"
     }]
 
+# Every tag seen so far of every GitHub repository. A refresh asks for tags
+# newest commit first and stops paging through a repository as soon as it
+# reaches a tag that is already stored, so a repository with no new releases
+# costs one small page.
+history_path = 'itp_release_history.csv'
+history_fields = ["name", "tag", "date", "commit"]
+# Tags asked for per page, fewer once there is a history to stop at
+first_page = 100
+refresh_page = 10
 
-with open("itp_github_stats.csv", "w") as f:
-    writer = csv.DictWriter(f, fieldnames=["name", "latest_release_date", "latest_release_name", "url", "release_url"])
+def refs_fields(page_size, cursor):
+    return '''
+    refs(refPrefix: "refs/tags/", first: {}, after: {}, orderBy: {{field: TAG_COMMIT_DATE, direction: DESC}}) {{
+      pageInfo {{ hasNextPage endCursor }}
+      nodes {{
+        name
+        target {{ ...commit ... on Tag {{ target {{ ...commit }} }} }}
+      }}
+    }}
+    defaultBranchRef {{ target {{ ...commit }} }}
+'''.format(page_size, json.dumps(cursor))
+commit_fragment = '''
+fragment commit on Commit {
+  oid
+  committedDate
+}
+'''
 
-    # Then play with your Github objects:
-    writer.writeheader()
+def query(pages):
+    # pages is a list of (remote, page size, cursor)
+    repositories = []
+    for i, (remote, page_size, cursor) in enumerate(pages):
+        owner, name = remote['repo'].split('/')
+        repositories.append('  r{}: repository(owner: "{}", name: "{}") {{{}  }}'.format(i, owner, name, refs_fields(page_size, cursor)))
+    return 'query {{\n{}\n}}\n{}'.format('\n'.join(repositories), commit_fragment)
+
+def fetch_batch(session, pages):
+    response = session.post(graphql_url, json={'query': query(pages)}, timeout=60)
+    response.raise_for_status()
+    result = response.json()
+    if result.get('errors'):
+        raise RuntimeError('GitHub query failed: {}'.format('; '.join(error['message'] for error in result['errors'])))
+    repositories = [result['data']['r{}'.format(i)] for i in range(len(pages))]
+    for (remote, _, _), repository in zip(pages, repositories):
+        if repository is None:
+            raise RuntimeError('{} ({}) was not found on GitHub'.format(remote['name'], remote['repo']))
+    return repositories
+
+def commit_of(target):
+    # A lightweight tag or branch points at the commit, an annotated tag at a
+    # Tag that points at it
+    return target['target'] if 'target' in target else target
+
+def commit_date(commit):
+    # Written the same way as the datetimes PyGithub returned
+    return datetime.datetime.strptime(commit['committedDate'], "%Y-%m-%dT%H:%M:%SZ")
+
+def load_history(path=history_path):
+    history = {remote['name']: [] for remote in remotes}
+    if os.path.exists(path):
+        with open(path, "r", newline='') as f:
+            for row in csv.DictReader(f):
+                history.setdefault(row['name'], []).append(row)
+    return history
+
+def save_history(history, path=history_path):
+    partial = path + '.partial'
+    with open(partial, "w", newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=history_fields)
+        writer.writeheader()
+        for name in history:
+            writer.writerows(sorted(history[name], key=lambda row: (row['date'], row['tag']), reverse=True))
+    os.replace(partial, path)
+
+def refresh_history(session, history):
+    # Pages through the new tags of every repository at once, a batch of
+    # repositories per query. Returns the head of the default branch of each
+    # repository, used for those with no tags at all.
+    known = {name: {row['tag'] for row in rows} for name, rows in history.items()}
+    pending = [(remote, refresh_page if known[remote['name']] else first_page, None) for remote in remotes]
+    heads = {}
+    while pending:
+        batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        with ThreadPoolExecutor(max_workers=len(batches)) as pool:
+            results = list(pool.map(lambda batch: fetch_batch(session, batch), batches))
+        following = []
+        for (remote, page_size, _), repository in zip(pending, [repository for result in results for repository in result]):
+            name = remote['name']
+            if repository['defaultBranchRef'] is not None:
+                heads.setdefault(name, repository['defaultBranchRef']['target'])
+            reached_known = False
+            for tag in repository['refs']['nodes']:
+                if tag['name'] in known[name]:
+                    reached_known = True
+                    continue
+                commit = commit_of(tag['target'])
+                if 'committedDate' not in commit:
+                    # Tags of trees or blobs have no date to go by
+                    continue
+                known[name].add(tag['name'])
+                history[name].append({'name': name, 'tag': tag['name'], 'date': commit['committedDate'], 'commit': commit['oid']})
+            page_info = repository['refs']['pageInfo']
+            if page_info['hasNextPage'] and not reached_known:
+                following.append((remote, page_size, page_info['endCursor']))
+        pending = following
+    return heads
+
+def github_row(remote, tags, head):
+    if not tags:
+        return {
+            'name': remote['name'],
+            'latest_release_date': commit_date(head),
+            'latest_release_name': 'Unversioned, last commit {}'.format(head['oid'][:7]),
+            'url': 'https://github.com/' + remote['repo'] + '/',
+            'release_url': 'https://api.github.com/repos/{}/commits/{}'.format(remote['repo'], head['oid'])
+        }
+    tag = max(tags, key=lambda row: (row['date'], row['tag']))
+    return {
+        'name': remote['name'],
+        'latest_release_date': commit_date({'committedDate': tag['date']}),
+        'latest_release_name': tag['tag'],
+        'url': 'https://github.com/' + remote['repo'] + '/',
+        'release_url': 'https://github.com/{}/releases/tag/{}'.format(remote['repo'], tag['tag'])
+    }
+
+def github_rows(session):
+    history = load_history()
+    heads = refresh_history(session, history)
+    save_history(history)
+    rows = []
     for remote in remotes:
-        print(remote['name'])
-        repo = g.get_repo(remote['repo'])
-        tags = repo.get_tags()
-        if tags.totalCount == 0:
-            commit = repo.get_branch(repo.default_branch).commit
-            writer.writerow({
-                'name': remote['name'],
-                'latest_release_date': commit.commit.committer.date,
-                'latest_release_name': 'Unversioned, last commit {}'.format(commit.commit.sha[:7]),
-                'url': 'https://github.com/' + remote['repo'] + '/',
-                'release_url': "https://github.com/{}/".format(remote['repo']),
-                'release_url': commit.url
-            })
-        else:
-            tag = None
-            if remote['name'] == 'Isabelle':
-                tag = tags[1]
-            else:
-                tag = tags[0]
-            writer.writerow({
-                'name': remote['name'],
-                'latest_release_date': tag.commit.commit.committer.date,
-                'latest_release_name': tag.name,
-                'url': 'https://github.com/' + remote['repo'] + '/',
-                'release_url': 'https://github.com/{}/releases/tag/{}'.format(remote['repo'], tag.name)
-            })
-    
-    # Some ITPs don't have GitHub sadly
+        tags = history[remote['name']]
+        if 'release' in remote:
+            tags = [row for row in tags if re.match(remote['release'], row['tag'])]
+        rows.append(github_row(remote, tags, heads.get(remote['name'])))
+    return rows
+
+# Some ITPs don't have GitHub sadly
+def atelier_b_rows(session):
     # Alterier B I can get from here: https://www.atelierb.eu/en/atelier-b-support-maintenance/download-atelier-b/
-    print("Atelier B")
-    source = requests.get('https://www.atelierb.eu/en/atelier-b-support-maintenance/download-atelier-b/').text
+    source = session.get('https://www.atelierb.eu/en/atelier-b-support-maintenance/download-atelier-b/', timeout=60).text
     soup = BeautifulSoup(source, 'html.parser')
+    rows = []
     for link in soup.find_all('a'):
         match = re.match(r"https://www.atelierb.eu/wp-content/uploads/(\d\d\d\d)/(\d\d)/atelierb-free-([\d.]+)-win32.exe", link['href'])
         if match:
             year = match.group(1)
             month = match.group(2)
             version = match.group(3)
-            writer.writerow({
+            rows.append({
                 'name': 'Atelier B',
                 'latest_release_date': datetime.datetime.strptime("{} {}".format(month, year), "%m %Y"),
                 'latest_release_name': version,
                 'url': 'https://www.atelierb.eu/en/atelier-b-support-maintenance/download-atelier-b/',
                 'release_url': ''
             })
+    return rows
 
-
+def mizar_rows(session):
     # Mizar I can get from here: http://mizar.uwb.edu.pl/~softadm/current/
-    print("Mizar")
-    source = requests.get('http://mizar.uwb.edu.pl/~softadm/current/').text
+    source = session.get('http://mizar.uwb.edu.pl/~softadm/current/', timeout=60).text
     soup = BeautifulSoup(source, 'html.parser')
     match = re.search(r"mizar-([\.\d]+)_[\.\d]+-arm-linux.tar\s+([\d-]+)\s+([\d:]+)", soup.find('pre').get_text())
-    if match:
-        version = match.group(1)
-        date = match.group(2)
-        writer.writerow({
-            'name': 'Mizar',
-            'latest_release_date': datetime.datetime.strptime("{}".format(date), "%Y-%m-%d"),
-            'latest_release_name': version,
-            'url': 'http://mizar.uwb.edu.pl/~softadm/current/',
-            'release_url': ''
-        })
-
+    if not match:
+        return []
+    version = match.group(1)
+    date = match.group(2)
+    return [{
+        'name': 'Mizar',
+        'latest_release_date': datetime.datetime.strptime("{}".format(date), "%Y-%m-%d"),
+        'latest_release_name': version,
+        'url': 'http://mizar.uwb.edu.pl/~softadm/current/',
+        'release_url': ''
+    }]
 
+def zeves_rows(session):
     # Z/EVES can be found here: https://sourceforge.net/projects/czt/files/czt-ide/nightly/
-    print("Z/EVES")
-    source = requests.get('https://sourceforge.net/projects/czt/files/czt-ide/nightly/').text
+    source = session.get('https://sourceforge.net/projects/czt/files/czt-ide/nightly/', timeout=60).text
     first_row = BeautifulSoup(source, 'html.parser').tbody.tr
     name = first_row.th.a.get_text()
     date = first_row.td.get_text()
     release_url = first_row.th.a['href']
-    
-    writer.writerow({
+    return [{
         'name': 'Z/EVES',
         'latest_release_date': datetime.datetime.strptime(date, "%Y-%m-%d"),
         'latest_release_name': name.strip(),
         'url': 'https://sourceforge.net/projects/czt/files/czt-ide/nightly/',
         'release_url': 'https://sourceforge.net{}'.format(release_url)
-    })
+    }]
+
+def fetch_all(token):
+    github = requests.Session()
+    github.headers['Authorization'] = 'bearer {}'.format(token)
+    pages = requests.Session()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        jobs = [pool.submit(github_rows, github)]
+        jobs += [pool.submit(scrape, pages) for scrape in [atelier_b_rows, mizar_rows, zeves_rows]]
+        # Rows keep the order they always had, GitHub first
+        return [row for job in jobs for row in job.result()]
+
+def main(output="itp_github_stats.csv"):
+    rows = fetch_all(os.environ['GITHUB_TOKEN'])
+    with open(output, "w") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    for row in rows:
+        print('{}: {}'.format(row['name'], row['latest_release_name']))
 
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,14 @@
 import csv
+import os
+import sys
 
-classifications = {}
-verified = set()
-new_rows = []
-with open("src/library_data/afp_packages.csv", "r") as f:
-    reader = csv.DictReader(f)
-    for package in reader:
-        name = package['package']
-        if name not in classifications:
-            classifications[name] = package
-        else: 
-            if package['verified']:
-                classifications[name] = package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from catalog import Catalog
 
-with open("new_afp.csv", "w") as f:
-    w = csv.DictWriter(f, fieldnames=["package","description","url","authors","category","msc","verified"])
-    w.writeheader()
-    w.writerows(classifications.values())
+# Keeps one row per AFP entry, preferring the last verified one
+catalog = Catalog()
+afp = catalog.library_id("Isabelle", "AFP")
+with open("src/library_data/afp_packages.csv", "r", newline='') as f:
+    catalog.load_modules(afp, csv.DictReader(f))
+catalog.deduplicate(afp)
+catalog.write_library(afp, "new_afp.csv", ["package","description","url","authors","category","msc","verified"])
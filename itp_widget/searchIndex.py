@@ -0,0 +1,73 @@
+import bisect
+import itertools
+import re
+import unicodedata
+
+# An inverted index over the names, descriptions and authors of modules, so the
+# widget finds modules by looking up posting lists rather than reading every
+# module. Terms are kept sorted, which makes every term starting with a prefix
+# a contiguous range found by binary search. Each term's postings are the
+# sorted positions of the modules containing it, stored as the gaps between
+# them so they stay small numbers.
+#
+# search.ts in the widget tokenizes and searches the same way, keep the two in
+# step.
+fields = ['package', 'description', 'authors']
+separator = re.compile(r'[^a-z0-9]+')
+# Single characters match too much to be worth storing
+min_length = 2
+
+def words(text):
+    # Accents are split off by NFKD and dropped with everything else that
+    # isn't a letter or digit
+    return [word for word in separator.split(unicodedata.normalize('NFKD', text).lower()) if word]
+
+def tokenize(text):
+    return [word for word in words(text) if len(word) >= min_length]
+
+def module_tokens(row):
+    return {token for field in fields for token in tokenize(row.get(field, ''))}
+
+def delta_encode(positions):
+    return [position - previous for previous, position in zip([0] + positions, positions)]
+
+def delta_decode(gaps):
+    return list(itertools.accumulate(gaps))
+
+def build(rows):
+    # rows are the modules in the order they are numbered
+    postings = {}
+    for position, row in enumerate(rows):
+        for token in module_tokens(row):
+            postings.setdefault(token, []).append(position)
+    terms = sorted(postings)
+    return {'terms': terms, 'postings': [delta_encode(postings[term]) for term in terms]}
+
+def prefix_range(terms, prefix):
+    start = bisect.bisect_left(terms, prefix)
+    # Terms are ASCII, so nothing starting with prefix sorts after this
+    end = bisect.bisect_left(terms, prefix + '\x7f', start)
+    return start, end
+
+def matching(index, prefix):
+    start, end = prefix_range(index['terms'], prefix)
+    if end - start == 1:
+        return delta_decode(index['postings'][start])
+    found = set()
+    for postings in index['postings'][start:end]:
+        found.update(itertools.accumulate(postings))
+    return sorted(found)
+
+def search(index, query):
+    # Positions of the modules with a term starting with every word of query,
+    # the longest words first as they usually match the fewest modules
+    tokens = sorted(set(words(query)), key=len, reverse=True)
+    if not tokens:
+        return []
+    result = None
+    for token in tokens:
+        positions = matching(index, token)
+        result = positions if result is None else sorted(set(result).intersection(positions))
+        if not result:
+            return []
+    return result
@@ -403,10 +403,25 @@ type alias Library =
     , section : String
     , file : String
     , url : String
+    , summary : LibrarySummary
     , entries : List RawPackage
     }
 
 
+-- Counts from the manifest of the library bundle, known before any of the
+-- entries have been loaded. Excluded modules are not counted in the others.
+
+
+type alias LibrarySummary =
+    { modules : Int
+    , verified : Int
+    , excluded : Int
+    , unclassified : Int
+    , sure : Int
+    , unsure : Int
+    }
+
+
 type alias RawPackage =
     { name : String
     , url : String
@@ -2,6 +2,7 @@ port module Main exposing (main)
 
 import Browser
 import Classification
+import Dict
 import HashSet
 import Html
 import Html.Attributes as Attr
@@ -10,6 +11,7 @@ import ITP
 import Json.Decode
 import Json.Encode
 import List.Extra
+import Set
 import Time
 import VegaLite
 
@@ -23,7 +25,14 @@ type alias Flags =
 
 type alias Model =
     { provers : List ITP.ITP
+    , classifications : List Classification.TopClassification
     , msc : Classification.Classification
+    , requestedLibraries : Set.Set String
+    , loadedLibraries : Set.Set String
+    , descriptions : Dict.Dict String String
+    , searchQuery : String
+    , searchResults : List SearchedPackage
+    , searchTotal : Int
     , view : View
     , filteredLibraries : HashSet.HashSet Classification.LibraryDetails
     , openLibrarySection : String
@@ -58,6 +67,7 @@ type alias GenericFeatureViewModelData =
 
 type alias LibraryViewModelData =
     { libraries : List ProverLibraryViewModelData
+    , libraryCount : Int
     , mscChildren : List Classification.MSCClassification
     , openClassificationCodeView : Maybe Classification.MSCDescription
     , showUnclassifiedPackages : Bool
@@ -69,6 +79,9 @@ type alias LibraryViewModelData =
     , showUnverifiedPackages : Bool
     , packages : List PackageView
     , openPackage : Maybe PackageView
+    , searchQuery : String
+    , searchResults : List PackageView
+    , searchTotal : Int
     }
 
 
@@ -99,13 +112,13 @@ type alias PackageView =
     }
 
 
-packageToPackageView : Maybe String -> Classification.Package -> PackageView
-packageToPackageView currentlyOpenPackage package =
+packageToPackageView : Dict.Dict String String -> Maybe String -> Classification.Package -> PackageView
+packageToPackageView descriptions currentlyOpenPackage package =
     { name = package.name
     , url = package.url
     , prover = package.library.prover
     , section = package.library.section
-    , description = package.description
+    , description = Maybe.withDefault package.description (Dict.get (descriptionKey package.library.prover package.library.section package.name) descriptions)
     , verified = package.verified
     , authors = package.authors
     , open = Just package.name == currentlyOpenPackage
@@ -113,6 +126,11 @@ packageToPackageView currentlyOpenPackage package =
     }
 
 
+descriptionKey : String -> String -> String -> String
+descriptionKey prover section name =
+    prover ++ "-" ++ section ++ "/" ++ name
+
+
 type alias File =
     { contents : String
     , name : String
@@ -131,6 +149,84 @@ port renderVegaSpec : VegaGraph -> Cmd msg
 port saveFile : File -> Cmd msg
 
 
+type alias LibraryKey =
+    { prover : String
+    , section : String
+    }
+
+
+type alias PackageDescription =
+    { name : String
+    , description : String
+    }
+
+
+type alias LoadedDescriptions =
+    { prover : String
+    , section : String
+    , descriptions : List PackageDescription
+    }
+
+
+libraryId : ITP.Library -> String
+libraryId library =
+    library.itp ++ "-" ++ library.section
+
+
+port loadLibrary : LibraryKey -> Cmd msg
+
+
+port libraryLoaded : (ITP.Library -> msg) -> Sub msg
+
+
+port loadDescriptions : LibraryKey -> Cmd msg
+
+
+port descriptionsLoaded : (LoadedDescriptions -> msg) -> Sub msg
+
+
+-- The first results of a search, with the fields index.ts read from their
+-- libraries, and how many modules were found in all
+
+
+type alias SearchedPackage =
+    { prover : String
+    , section : String
+    , name : String
+    , url : String
+    , authors : String
+    , verified : Bool
+    , msc : String
+    }
+
+
+type alias SearchResults =
+    { query : String
+    , total : Int
+    , results : List SearchedPackage
+    }
+
+
+port searchPackages : String -> Cmd msg
+
+
+port packagesFound : (SearchResults -> msg) -> Sub msg
+
+
+searchedPackageToPackageView : Dict.Dict String String -> Maybe String -> SearchedPackage -> PackageView
+searchedPackageToPackageView descriptions currentlyOpenPackage package =
+    { name = package.name
+    , url = package.url
+    , prover = package.prover
+    , section = package.section
+    , description = Maybe.withDefault "" (Dict.get (descriptionKey package.prover package.section package.name) descriptions)
+    , verified = package.verified
+    , authors = package.authors
+    , open = Just package.name == currentlyOpenPackage
+    , msc = package.msc
+    }
+
+
 modelToViewModel : Model -> ViewModel
 modelToViewModel model =
     case model.view of
@@ -151,8 +247,11 @@ modelToViewModel model =
 
         FeatureView (LibraryFeatureValue value) ->
             let
+                allLibraries =
+                    List.concatMap (\prover -> prover.libraries) model.provers
+
                 libraries =
-                    List.map (Classification.libraryToLibraryDetails (Classification.codeToPrefix model.openLibrarySection)) <| List.concatMap (\prover -> prover.libraries) model.provers
+                    List.map (Classification.libraryToLibraryDetails (Classification.codeToPrefix model.openLibrarySection)) <| List.filter (libraryId >> flip Set.member model.loadedLibraries) allLibraries
 
                 all_packages =
                     getClassificationsFromTree
@@ -180,12 +279,16 @@ modelToViewModel model =
                         .verified
 
                 viewedPackages =
-                    List.map (packageToPackageView model.openPackage) (List.filter (\p -> p.msc == model.openLibrarySection) (List.filter (.library >> flip HashSet.member model.filteredLibraries) (Classification.getAllPackages model.msc)))
+                    List.map (packageToPackageView model.descriptions model.openPackage) (List.filter (\p -> p.msc == model.openLibrarySection) (List.filter (.library >> flip HashSet.member model.filteredLibraries) (Classification.getAllPackages model.msc)))
+
+                searchedPackages =
+                    List.map (searchedPackageToPackageView model.descriptions model.openPackage) model.searchResults
             in
             LibraryViewModel
                 { similarProvers = List.filter (\itp -> itp.library == value) model.provers
                 , featureInfo =
                     { libraries = List.map (\library -> { library = library, filtered = HashSet.member library model.filteredLibraries }) libraries
+                    , libraryCount = List.length allLibraries
                     , showUnclassifiedPackages = model.showUnclassifiedPackages
                     , showUnverifiedPackages = model.showUnverifiedPackages
                     , mscChildren =
@@ -206,11 +309,14 @@ modelToViewModel model =
                     , openClassificationCodeView = codeDescription
                     , showEmptyCategories = model.showEmptyCategories
                     , hasLibrary = value
-                    , unclassifiedPackages = List.map (packageToPackageView model.openPackage) (List.filter (.library >> flip HashSet.member model.filteredLibraries) (Classification.getUnclassified model.msc))
+                    , unclassifiedPackages = List.map (packageToPackageView model.descriptions model.openPackage) (List.filter (.library >> flip HashSet.member model.filteredLibraries) (Classification.getUnclassified model.msc))
                     , vegaSpec = createClassifiedPackagesGraph bars
                     , classificationFileContents = packageListToCsv (Classification.getAllPackages model.msc)
                     , packages = viewedPackages
-                    , openPackage = List.Extra.find (\p -> Just p.name == model.openPackage) viewedPackages
+                    , openPackage = List.Extra.find (\p -> Just p.name == model.openPackage) (viewedPackages ++ searchedPackages)
+                    , searchQuery = model.searchQuery
+                    , searchResults = searchedPackages
+                    , searchTotal = model.searchTotal
                     }
                 }
 
@@ -340,7 +446,14 @@ init flags =
             List.concatMap .libraries flags.provers
     in
     ( { provers = flags.provers
+      , classifications = flags.msc
       , msc = Classification.new flags.msc libraries
+      , requestedLibraries = Set.empty
+      , loadedLibraries = Set.empty
+      , descriptions = Dict.empty
+      , searchQuery = ""
+      , searchResults = []
+      , searchTotal = 0
       , view = ProverListView
       , openLibrarySection = "??-XX"
       , showEmptyCategories = False
@@ -356,7 +469,11 @@ init flags =
 
 subscriptions : Model -> Sub Msg
 subscriptions _ =
-    Sub.none
+    Sub.batch
+        [ libraryLoaded LibraryLoaded
+        , descriptionsLoaded DescriptionsLoaded
+        , packagesFound SearchResultsLoaded
+        ]
 
 
 type Feature
@@ -401,7 +518,13 @@ type Msg
     = FocusView View
     | OpenLibrarySection String
     | DownloadFile String String
-    | OpenPackage String
+    | OpenPackage PackageView
+    | OpenProverLibraries ITP.ITP
+    | LoadAllLibraries
+    | LibraryLoaded ITP.Library
+    | DescriptionsLoaded LoadedDescriptions
+    | Search String
+    | SearchResultsLoaded SearchResults
     | ShowUnclassifiedPackages Bool
     | SetSeeEmpty Bool
     | ToggleShowLibrary Classification.LibraryDetails Bool
@@ -411,45 +534,34 @@ type Msg
 createITPOverviewChart : Model -> VegaLite.Spec
 createITPOverviewChart model =
     let
-        all_packages =
-            Classification.getAllPackages model.msc
-
+        -- From the summaries in the manifest, so every prover is shown before
+        -- any library is loaded
         bars =
-            List.Extra.gatherEqualsBy (.library >> .prover) all_packages
+            List.filter (.libraries >> List.isEmpty >> not) model.provers
+
+        total field prover =
+            toFloat (List.sum (List.map (.summary >> field) prover.libraries))
 
         data =
             VegaLite.dataFromRows []
                 (List.concatMap
-                    (\( example, packages ) ->
-                        let
-                            ( excluded, notExcluded ) =
-                                List.partition Classification.packageIsExcluded (example :: packages)
-
-                            ( unclassified, classified ) =
-                                List.partition Classification.packageIsUnclassified notExcluded
-
-                            ( verified, unverified ) =
-                                List.partition .verified classified
-
-                            ( unsure, sure ) =
-                                List.partition (\p -> String.endsWith "xx" (String.toLower p.msc)) verified
-                        in
+                    (\prover ->
                         VegaLite.dataRow
-                            [ ( "prover", VegaLite.str example.library.prover )
+                            [ ( "prover", VegaLite.str prover.name )
                             , ( "class", VegaLite.str "verified" )
-                            , ( "count", VegaLite.num (toFloat (List.length sure)) )
+                            , ( "count", VegaLite.num (total .sure prover) )
                             ]
                             (List.concat
                                 [ VegaLite.dataRow
-                                    [ ( "prover", VegaLite.str example.library.prover )
+                                    [ ( "prover", VegaLite.str prover.name )
                                     , ( "class", VegaLite.str "needs professional" )
-                                    , ( "count", VegaLite.num (toFloat <| List.length unsure) )
+                                    , ( "count", VegaLite.num (total .unsure prover) )
                                     ]
                                     []
                                 , VegaLite.dataRow
-                                    [ ( "prover", VegaLite.str example.library.prover )
+                                    [ ( "prover", VegaLite.str prover.name )
                                     , ( "class", VegaLite.str "excluded" )
-                                    , ( "count", VegaLite.num (toFloat <| List.length excluded) )
+                                    , ( "count", VegaLite.num (total .excluded prover) )
                                     ]
                                     []
                                 ]
@@ -565,6 +677,21 @@ updateVegaSpec ( model, command ) =
             ( model, Cmd.batch [ command, renderVegaSpec (VegaGraph "library-graph" (createClassifiedPackagesGraph bars)) ] )
 
 
+-- Asks for the entries of every library not asked for already. They arrive
+-- one library at a time through libraryLoaded.
+
+
+loadLibraries : List ITP.Library -> ( Model, Cmd Msg ) -> ( Model, Cmd Msg )
+loadLibraries libraries ( model, command ) =
+    let
+        pending =
+            List.filter (\library -> not (Set.member (libraryId library) model.requestedLibraries)) libraries
+    in
+    ( { model | requestedLibraries = List.foldl (libraryId >> Set.insert) model.requestedLibraries pending }
+    , Cmd.batch (command :: List.map (\library -> loadLibrary { prover = library.itp, section = library.section }) pending)
+    )
+
+
 update : Msg -> Model -> ( Model, Cmd Msg )
 update message model =
     case message of
@@ -583,8 +710,73 @@ update message model =
         OpenLibrarySection section ->
             updateVegaSpec <| ( { model | openLibrarySection = section, openPackage = Nothing }, Cmd.none )
 
-        OpenPackage section ->
-            ( { model | openPackage = Just section }, Cmd.none )
+        OpenPackage package ->
+            ( { model | openPackage = Just package.name }
+            , if Dict.member (descriptionKey package.prover package.section package.name) model.descriptions then
+                Cmd.none
+
+              else
+                loadDescriptions { prover = package.prover, section = package.section }
+            )
+
+        OpenProverLibraries prover ->
+            loadLibraries prover.libraries (update (FocusView (FeatureView (LibraryFeatureValue True))) model)
+
+        LoadAllLibraries ->
+            loadLibraries (List.concatMap .libraries model.provers) ( model, Cmd.none )
+
+        LibraryLoaded loaded ->
+            let
+                provers =
+                    List.map
+                        (\prover ->
+                            { prover
+                                | libraries =
+                                    List.map
+                                        (\library ->
+                                            if libraryId library == libraryId loaded then
+                                                loaded
+
+                                            else
+                                                library
+                                        )
+                                        prover.libraries
+                            }
+                        )
+                        model.provers
+            in
+            update (FocusView model.view)
+                { model
+                    | provers = provers
+                    , msc = Classification.new model.classifications (List.concatMap .libraries provers)
+                    , loadedLibraries = Set.insert (libraryId loaded) model.loadedLibraries
+                }
+
+        DescriptionsLoaded loaded ->
+            ( { model
+                | descriptions =
+                    List.foldl
+                        (\package -> Dict.insert (descriptionKey loaded.prover loaded.section package.name) package.description)
+                        model.descriptions
+                        loaded.descriptions
+              }
+            , Cmd.none
+            )
+
+        Search query ->
+            if String.isEmpty (String.trim query) then
+                ( { model | searchQuery = query, searchResults = [], searchTotal = 0 }, Cmd.none )
+
+            else
+                ( { model | searchQuery = query }, searchPackages query )
+
+        SearchResultsLoaded loaded ->
+            -- Results of an older query can arrive after those of a newer one
+            if loaded.query == model.searchQuery then
+                ( { model | searchResults = loaded.results, searchTotal = loaded.total }, Cmd.none )
+
+            else
+                ( model, Cmd.none )
 
         ShowUnclassifiedPackages show ->
             ( { model | showUnclassifiedPackages = show }, Cmd.none )
@@ -791,20 +983,17 @@ viewFeatureCell prover feature =
         LibraryFeature ->
             if prover.library then
                 let
-                    allPackages =
-                        List.concatMap (\l -> List.filter (Classification.packageIsExcluded >> not) l.entries) prover.libraries
-
                     allPackageCount =
-                        List.length allPackages
+                        List.sum (List.map (.summary >> .modules) prover.libraries)
 
                     verifiedPackageCount =
-                        List.length (List.filter .verified allPackages)
+                        List.sum (List.map (.summary >> .verified) prover.libraries)
                 in
                 if allPackageCount > 0 then
-                    Html.span [ Attr.class "clickable", Event.onClick (FocusView (FeatureView (LibraryFeatureValue True))) ] [ Html.text <| String.concat [ "Total Modules: ", String.fromInt allPackageCount, ". Verified Modules: ", String.fromInt verifiedPackageCount, "." ] ]
+                    Html.span [ Attr.class "clickable", Event.onClick (OpenProverLibraries prover) ] [ Html.text <| String.concat [ "Total Modules: ", String.fromInt allPackageCount, ". Verified Modules: ", String.fromInt verifiedPackageCount, "." ] ]
 
                 else
-                    Html.span [ Attr.class "clickable", Event.onClick (FocusView (FeatureView (LibraryFeatureValue True))) ] [ Html.text "Library Excluded" ]
+                    Html.span [ Attr.class "clickable", Event.onClick (OpenProverLibraries prover) ] [ Html.text "Library Excluded" ]
 
             else
                 Html.span [ Attr.class "clickable", Event.onClick (FocusView (FeatureView (LibraryFeatureValue False))) ] [ Html.text "Does not have library support" ]
@@ -877,7 +1066,7 @@ viewSimilarProvers similarProvers =
 
 
 viewLibrary : List ITP.ITP -> LibraryViewModelData -> Html.Html Msg
-viewLibrary similarProvers { openClassificationCodeView, mscChildren, showEmptyCategories, unclassifiedPackages, hasLibrary, showUnclassifiedPackages, libraries, vegaSpec, classificationFileContents, showUnverifiedPackages, packages, openPackage } =
+viewLibrary similarProvers { openClassificationCodeView, mscChildren, showEmptyCategories, unclassifiedPackages, hasLibrary, showUnclassifiedPackages, libraries, libraryCount, vegaSpec, classificationFileContents, showUnverifiedPackages, packages, openPackage, searchQuery, searchResults, searchTotal } =
     Html.div []
         [ Html.h3 [] [ Html.text "Library Support" ]
         , Html.p []
@@ -892,6 +1081,15 @@ viewLibrary similarProvers { openClassificationCodeView, mscChildren, showEmptyC
             Html.div []
                 [ Html.text "Provers that have libraries allow for the extension of their cabalities through libraries and packages. The following provers have libraries "
                 , Html.div [ Attr.id "overview-graph" ] []
+                , Html.p []
+                    (Html.text (String.concat [ "Modules of ", String.fromInt (List.length libraries), " of ", String.fromInt libraryCount, " libraries are loaded. " ])
+                        :: (if List.length libraries < libraryCount then
+                                [ Html.span [ Attr.class "clickable", Event.onClick LoadAllLibraries ] [ Html.text "Load every library" ] ]
+
+                            else
+                                []
+                           )
+                    )
                 , Html.div [] [ checkbox "Show empty categories" showEmptyCategories SetSeeEmpty ]
                 , Html.div [] [ checkbox "Show unverified packages" showUnverifiedPackages SetShowUnverified ]
                 , viewClassification openClassificationCodeView mscChildren
@@ -902,6 +1100,14 @@ viewLibrary similarProvers { openClassificationCodeView, mscChildren, showEmptyC
                     , Html.button [ Event.onClick (DownloadFile "library_stats.csv" (createLibraryCsv libraries)) ] [ Html.text "Download library stats" ]
                     , Html.button [ Event.onClick (DownloadFile "classification.csv" classificationFileContents) ] [ Html.text "Download all modules" ]
                     ]
+                , Html.h3 [] [ Html.text "Search packages" ]
+                , Html.input [ Attr.type_ "search", Attr.value searchQuery, Attr.placeholder "Name, description or authors", Event.onInput Search ] []
+                , if searchTotal > List.length searchResults then
+                    Html.p [] [ Html.text (String.concat [ "Showing the first ", String.fromInt (List.length searchResults), " of ", String.fromInt searchTotal, " modules found" ]) ]
+
+                  else
+                    Html.div [] []
+                , viewPackageList searchResults
                 , Html.h3 [] [ Html.text "Packages of this category:" ]
                 , viewPackageList packages
                 , Maybe.withDefault (Html.div [] []) (Maybe.map viewPackageDetails openPackage)
@@ -1092,7 +1298,7 @@ viewPackage package =
 
                 else
                     "unverified clickable"
-            , Event.onClick (OpenPackage package.name)
+            , Event.onClick (OpenPackage package)
             ]
             [ Html.text package.name ]
         ]
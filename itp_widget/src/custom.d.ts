@@ -2,3 +2,10 @@ declare module '*.csv' {
   const content: string;
   export default content;
 }
+
+// Not in the DOM types of this version of TypeScript yet
+declare class DecompressionStream {
+  constructor(format: 'gzip' | 'deflate' | 'deflate-raw');
+  readonly readable: ReadableStream<Uint8Array>;
+  readonly writable: WritableStream<Uint8Array>;
+}
@@ -2,7 +2,7 @@ import {Elm} from './Main';
 import msc from './msc.json';
 import itpFile from './itps.csv'
 import itpGithubFile from './itp_github_stats.csv'
-import libraryIndexFile from './libraries.csv'
+import libraryManifest from './library_bundle/manifest.json'
 import counterExampleFile from './counterExampleIntegrations.csv'
 import counterExampleGeneratorFile from './counterExampleGenerators.csv'
 import itpProjects from './projects.csv'
@@ -10,20 +10,9 @@ import * as d3 from 'd3'
 import './style.css';
 import embed from 'vega-embed';
 import { saveAs } from 'file-saver';
+import { SearchShard, search } from './search';
 
 
-function parsePackage(v : d3.DSVRowString<string>){
-  return {
-    msc: v.msc, 
-    name: v.package, 
-    authors: v.authors, 
-    description: v.description, 
-    category: v.category, 
-    url: v.url, 
-    verified: v.verified === 'True',
-  }
-}
-
 export type Package = {
   name: string,
   url: string,
@@ -34,24 +23,160 @@ export type Package = {
 }
 
 
+type LibrarySummary = {
+  modules: number,
+  verified: number,
+  excluded: number,
+  unclassified: number,
+  sure: number,
+  unsure: number
+}
+
 type Library = {
   itp: string,
   section: string,
   file: string,
   url: string,
+  summary: LibrarySummary,
   entries: Package[]
 }
 
-function parseLibrary(v : d3.DSVRowString<string>): Library {
+// Written by bundleData.py. The manifest has every library and its summary,
+// the shards have its entries and their descriptions. Entries are stored a
+// column at a time, strings as positions in the shard's string table and MSC
+// codes as positions in its codes.
+type ManifestLibrary = {
+  itp: string,
+  section: string,
+  file: string,
+  url: string,
+  entries: string,
+  descriptions: string,
+  summary: LibrarySummary
+}
+
+type EntriesShard = {
+  version: number,
+  strings: string[],
+  codes: string[],
+  entries: {
+    name: number[],
+    authors: number[],
+    category: number[],
+    url: number[],
+    msc: number[],
+    verified: number[]
+  }
+}
+
+type DescriptionsShard = {
+  version: number,
+  descriptions: string[]
+}
+
+const manifestLibraries : ManifestLibrary[] = libraryManifest.libraries
+const manifestLibrariesByKey = new Map(manifestLibraries.map(l => [l.itp + '-' + l.section, l] as [string, ManifestLibrary]))
+
+function findManifestLibrary(prover: string, section: string): ManifestLibrary {
+  return manifestLibrariesByKey.get(prover + '-' + section)
+}
+
+function manifestLibrary(l : ManifestLibrary): Library {
   return {
-    itp: v.name,
-    section: v.section,
-    file: v.file,
-    url: v.url,
+    itp: l.itp,
+    section: l.section,
+    file: l.file,
+    url: l.url,
+    summary: l.summary,
     entries: []
   }
 }
 
+const shards = new Map<string, Promise<any>>()
+
+function readShard(name: string): Promise<any> {
+  if (!shards.has(name)) {
+    shards.set(name, fetchShard(name))
+  }
+  return shards.get(name)
+}
+
+async function fetchShard(name: string): Promise<any> {
+  let bytes = new Uint8Array(await (await fetch(libraryShards[name])).arrayBuffer())
+  // Some servers already decompress it on the way
+  if (bytes[0] === 0x1f && bytes[1] === 0x8b) {
+    let stream = new Response(bytes).body.pipeThrough(new DecompressionStream('gzip'))
+    bytes = new Uint8Array(await new Response(stream).arrayBuffer())
+  }
+  return JSON.parse(new TextDecoder().decode(bytes))
+}
+
+const libraryEntries = new Map<string, Promise<Library>>()
+
+function readLibraryEntries(l : ManifestLibrary): Promise<Library> {
+  if (!libraryEntries.has(l.entries)) {
+    libraryEntries.set(l.entries, decodeLibraryEntries(l))
+  }
+  return libraryEntries.get(l.entries)
+}
+
+async function decodeLibraryEntries(l : ManifestLibrary): Promise<Library> {
+  let shard : EntriesShard = await readShard(l.entries)
+  let s = shard.strings
+  let e = shard.entries
+  return {
+    ...manifestLibrary(l),
+    // Descriptions are loaded once a package is opened
+    entries: e.name.map((name, i) => ({
+      msc: shard.codes[e.msc[i]],
+      name: s[name],
+      authors: s[e.authors[i]],
+      description: '',
+      category: s[e.category[i]],
+      url: s[e.url[i]],
+      verified: e.verified[i] === 1,
+    }))
+  }
+}
+
+async function readLibraryDescriptions(prover: string, section: string) {
+  let library = findManifestLibrary(prover, section)
+  let [entries, shard] = await Promise.all([readLibraryEntries(library), readShard(library.descriptions) as Promise<DescriptionsShard>])
+  return {
+    prover,
+    section,
+    descriptions: entries.entries.map((p, i) => ({name: p.name, description: shard.descriptions[i]}))
+  }
+}
+
+const maxSearchResults = 100
+
+// The libraries of every ITP in the order its search shard numbers them
+const itpLibraries = new Map<string, ManifestLibrary[]>()
+for (let l of manifestLibraries) {
+  itpLibraries.set(l.itp, [...(itpLibraries.get(l.itp) || []), l])
+}
+
+// The search index of every ITP is only loaded on the first search. Only the
+// entries of the libraries with a result shown are loaded, and each of them
+// only once.
+async function searchModules(query: string) {
+  let shards : SearchShard[] = await Promise.all(libraryManifest.search.map(s => readShard(s.index)))
+  let total = 0
+  let hits : {library: ManifestLibrary, entry: number}[] = []
+  for (let shard of shards) {
+    let found = search(shard, query, maxSearchResults - hits.length)
+    total += found.total
+    hits.push(...found.hits.map(hit => ({library: itpLibraries.get(shard.itp)[hit.library], entry: hit.entry})))
+  }
+  let libraries = await Promise.all(hits.map(hit => readLibraryEntries(hit.library)))
+  return {
+    query,
+    total,
+    results: hits.map((hit, i) => ({...libraries[i].entries[hit.entry], prover: hit.library.itp, section: hit.library.section}))
+  }
+}
+
 type Project = {
   name: string,
   prover: string,
@@ -93,14 +218,6 @@ async function readProjectFiles(i: ProjectIndex): Promise<Project[]> {
   return projects.map((p) => ({...p, prover: i.name}))
 }
 
-async function readLibraryFiles(l : Library): Promise<Library> {
-  let entries = (await d3.csv(libraryFiles[l.file])).map(parsePackage)
-  return {
-    ...l,
-    entries
-  }
-}
-
 function requireAll(ctx: __WebpackModuleApi.RequireContext) : {[key: string]: string}  { 
   let keys = ctx.keys();
   let values = keys.map(ctx);
@@ -224,7 +341,7 @@ function readITP(v : d3.DSVRowString<string>, stats: ITPGithubStats[], libraries
 }
 
 const logos = requireAll(require.context('./logos/', true, /\.*$/));
-const libraryFiles = requireAll(require.context('./library_data/', true, /\.csv$/));
+const libraryShards = requireAll(require.context('./library_bundle/', true, /\.json\.gz$/));
 const projectFiles = requireAll(require.context('./project_data/', true, /\.csv$/));
 
 function readCounterExampleIntegrations(v : d3.DSVRowString<string>) : CounterExampleIntegration {
@@ -237,14 +354,15 @@ function readCounterExampleIntegrations(v : d3.DSVRowString<string>) : CounterEx
 }
 
 async function main(){
-  let libraries = (await d3.csv(libraryIndexFile)).map(parseLibrary)
   let projects = (await d3.csv(itpProjects)).map(parseProjectIndex)
   let filledProjects = [].concat.apply([], await Promise.all(projects.map(readProjectFiles)))
-  let filledLibraries = await Promise.all(libraries.map(readLibraryFiles))
+  // The provers are shown straight away from the manifest, the entries of a
+  // library are only loaded once Elm asks for them
+  let libraries = manifestLibraries.map(manifestLibrary)
   let itpGithubStats = (await d3.csv(itpGithubFile)).map(readITPGithubStats)
   let counterExampleIntegrations = (await d3.csv(counterExampleFile)).map(readCounterExampleIntegrations);
   let counterExampleGenerators = (await d3.csv(counterExampleGeneratorFile)).map(readCounterExampleGenerator);
-  let itps = (await d3.csv(itpFile)).map(i => readITP(i, itpGithubStats, filledLibraries, filledProjects, counterExampleIntegrations)).filter(i => i.tpCategory !== "ATP")
+  let itps = (await d3.csv(itpFile)).map(i => readITP(i, itpGithubStats, libraries, filledProjects, counterExampleIntegrations)).filter(i => i.tpCategory !== "ATP")
   let elm = Elm.Main.init({
     node: document.getElementById('itps'),
     flags: {
@@ -254,6 +372,18 @@ async function main(){
     }
   })
 
+  elm.ports.loadLibrary.subscribe(async ({prover, section}) => {
+    elm.ports.libraryLoaded.send(await readLibraryEntries(findManifestLibrary(prover, section)))
+  });
+
+  elm.ports.loadDescriptions.subscribe(async ({prover, section}) => {
+    elm.ports.descriptionsLoaded.send(await readLibraryDescriptions(prover, section))
+  });
+
+  elm.ports.searchPackages.subscribe(async (query) => {
+    elm.ports.packagesFound.send(await searchModules(query))
+  });
+
   elm.ports.renderVegaSpec.subscribe((spec) => {
     requestAnimationFrame(() => {
       // Change actions to true to display links to source, editor and image.
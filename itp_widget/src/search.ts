@@ -0,0 +1,83 @@
+// Searches the index written by searchIndex.py, which tokenizes and searches
+// the same way. A shard indexes one ITP's modules, numbered through its
+// libraries in the order of the manifest. Terms are sorted, so the terms
+// starting with a word are a range found by binary search, and postings are
+// gaps between positions.
+export type SearchShard = {
+  version: number,
+  itp: string,
+  libraries: {section: string, modules: number}[],
+  terms: string[],
+  postings: number[][]
+}
+
+// library is a position in the shard's libraries
+export type SearchHit = {
+  library: number,
+  entry: number
+}
+
+export function words(text: string): string[] {
+  // Accents are split off by NFKD and dropped with everything else that isn't
+  // a letter or digit
+  return text.normalize('NFKD').toLowerCase().split(/[^a-z0-9]+/).filter(w => w !== '')
+}
+
+function lowerBound(terms: string[], value: string, start: number): number {
+  let low = start
+  let high = terms.length
+  while (low < high) {
+    let middle = (low + high) >>> 1
+    if (terms[middle] < value) {
+      low = middle + 1
+    } else {
+      high = middle
+    }
+  }
+  return low
+}
+
+function matching(shard: SearchShard, prefix: string): Set<number> {
+  let start = lowerBound(shard.terms, prefix, 0)
+  // Terms are ASCII, so nothing starting with prefix sorts after this
+  let end = lowerBound(shard.terms, prefix + '\x7f', start)
+  let found = new Set<number>()
+  for (let i = start; i < end; i++) {
+    let position = 0
+    for (let gap of shard.postings[i]) {
+      position += gap
+      found.add(position)
+    }
+  }
+  return found
+}
+
+// Modules with a term starting with every word of query, the longest words
+// first as they usually match the fewest modules. Returns the number found
+// and the first limit of them.
+export function search(shard: SearchShard, query: string, limit: number = Infinity): {total: number, hits: SearchHit[]} {
+  let queryWords = Array.from(new Set(words(query))).sort((a, b) => b.length - a.length)
+  if (queryWords.length === 0) {
+    return {total: 0, hits: []}
+  }
+  let result: Set<number> = null
+  for (let word of queryWords) {
+    let positions = matching(shard, word)
+    result = result === null ? positions : new Set(Array.from(result).filter(p => positions.has(p)))
+    if (result.size === 0) {
+      return {total: 0, hits: []}
+    }
+  }
+  let hits: SearchHit[] = []
+  let sorted = Array.from(result).sort((a, b) => a - b).slice(0, limit)
+  let library = 0
+  let first = 0
+  for (let position of sorted) {
+    while (position >= first + shard.libraries[library].modules) {
+      first += shard.libraries[library].modules
+      library++
+    }
+    hits.push({library, entry: position - first})
+  }
+  return {total: result.size, hits}
+}
@@ -0,0 +1,122 @@
+import csv
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+import pullReleases
+
+# A local stand in for GitHub's GraphQL API. It answers the batched queries of
+# pullReleases.py from the tags in repositories, newest first, and notes every
+# page it is asked for.
+repository_alias = re.compile(r'(r\d+): repository\(owner: "([^"]+)", name: "([^"]+)"\)')
+refs_page = re.compile(r'first: (\d+), after: (null|"[^"]*")')
+
+def tag(name, date, annotated=False):
+    commit = {'oid': '{:040x}'.format(abs(hash(name))), 'committedDate': date}
+    return {'name': name, 'target': {'target': commit} if annotated else commit}
+
+class Handler(BaseHTTPRequestHandler):
+    repositories = {}
+    pages = []
+    queries = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        query = json.loads(self.rfile.read(int(self.headers['Content-Length'])))['query']
+        Handler.queries.append(query)
+        data = {}
+        aliases = list(repository_alias.finditer(query))
+        for match, page in zip(aliases, refs_page.finditer(query)):
+            alias, repo = match.group(1), '{}/{}'.format(match.group(2), match.group(3))
+            first, after = int(page.group(1)), json.loads(page.group(2))
+            Handler.pages.append((repo, first, after))
+            tags = Handler.repositories.get(repo)
+            if tags is None:
+                data[alias] = None
+                continue
+            start = int(after or 0)
+            data[alias] = {
+                'refs': {
+                    'pageInfo': {'hasNextPage': start + first < len(tags), 'endCursor': str(start + first)},
+                    'nodes': tags[start:start + first]
+                },
+                'defaultBranchRef': {'target': {'oid': 'f' * 40, 'committedDate': '2023-06-01T00:00:00Z'}}
+            }
+        body = json.dumps({'data': data}).encode('utf8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+isabelle = [
+    tag('isabelle-dev-2023', '2023-05-01T00:00:00Z'),
+    tag('Isabelle2023-RC1', '2023-04-01T00:00:00Z', annotated=True),
+    tag('Isabelle2022', '2022-10-01T00:00:00Z', annotated=True),
+    tag('Isabelle2021-1', '2021-12-01T00:00:00Z', annotated=True),
+    tag('Isabelle2021', '2021-02-01T00:00:00Z')
+]
+agda = [tag('v2.6.{}'.format(i), '2020-0{}-01T00:00:00Z'.format(i + 1)) for i in reversed(range(7))]
+
+@pytest.fixture
+def github(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    Handler.repositories = {'seL4/isabelle': list(isabelle), 'agda/agda': list(agda), 'getfol/GETFOL': []}
+    Handler.pages = []
+    Handler.queries = []
+    monkeypatch.setattr(pullReleases, 'graphql_url', 'http://127.0.0.1:{}/graphql'.format(httpd.server_address[1]))
+    monkeypatch.setattr(pullReleases, 'remotes', [remote for remote in pullReleases.remotes if remote['repo'] in Handler.repositories])
+    monkeypatch.setattr(pullReleases, 'batch_size', 2)
+    monkeypatch.setattr(pullReleases, 'first_page', 3)
+    monkeypatch.setattr(pullReleases, 'refresh_page', 2)
+    yield requests.Session()
+    httpd.shutdown()
+    httpd.server_close()
+
+def history():
+    with open(pullReleases.history_path, newline='') as f:
+        return [(row['name'], row['tag']) for row in csv.DictReader(f)]
+
+def test_first_run_pages_through_every_tag(github):
+    rows = {row['name']: row for row in pullReleases.github_rows(github)}
+    # Three repositories in batches of two, then the later pages of Isabelle
+    # and Agda, then the last page of Agda
+    assert sorted(len(repository_alias.findall(query)) for query in Handler.queries) == [1, 1, 2, 2]
+    assert [page for page in Handler.pages if page[0] == 'agda/agda'] == [('agda/agda', 3, None), ('agda/agda', 3, '3'), ('agda/agda', 3, '6')]
+    assert history() == [('Isabelle', row['name']) for row in isabelle] + [('Agda', row['name']) for row in agda]
+    # Isabelle's snapshots and release candidates are not releases
+    assert rows['Isabelle']['latest_release_name'] == 'Isabelle2022'
+    assert rows['Agda']['latest_release_name'] == 'v2.6.6'
+    assert rows['GETFOL']['latest_release_name'] == 'Unversioned, last commit fffffff'
+
+def test_up_to_date_history_asks_for_one_page(github):
+    pullReleases.github_rows(github)
+    Handler.pages = []
+    Handler.queries = []
+    rows = {row['name']: row for row in pullReleases.github_rows(github)}
+    assert sorted(Handler.pages) == [('agda/agda', 2, None), ('getfol/GETFOL', 3, None), ('seL4/isabelle', 2, None)]
+    assert len(history()) == len(isabelle) + len(agda)
+    assert rows['Isabelle']['latest_release_name'] == 'Isabelle2022'
+
+def test_refresh_stops_at_known_tag_on_later_page(github):
+    Handler.repositories['agda/agda'] = agda[2:]
+    pullReleases.github_rows(github)
+    assert ('Agda', 'v2.6.6') not in history()
+    # Two new tags fill the first page, the known one is reached on the second
+    Handler.repositories['agda/agda'] = list(agda)
+    Handler.repositories['seL4/isabelle'] = [tag('Isabelle2024', '2024-05-01T00:00:00Z', annotated=True)] + isabelle
+    Handler.pages = []
+    rows = {row['name']: row for row in pullReleases.github_rows(github)}
+    assert [page for page in Handler.pages if page[0] == 'agda/agda'] == [('agda/agda', 2, None), ('agda/agda', 2, '2')]
+    assert [page for page in Handler.pages if page[0] == 'seL4/isabelle'] == [('seL4/isabelle', 2, None)]
+    assert history().count(('Agda', 'v2.6.6')) == 1
+    assert len(history()) == len(isabelle) + len(agda) + 1
+    assert rows['Agda']['latest_release_name'] == 'v2.6.6'
+    assert rows['Isabelle']['latest_release_name'] == 'Isabelle2024'
@@ -16,7 +16,7 @@ module.exports = {
         use: ['style-loader', 'css-loader'],
       },
       {
-        test: /\.(csv|png|svg|jpg|jpeg|gif)$/i,
+        test: /\.(csv|gz|png|svg|jpg|jpeg|gif)$/i,
         type: 'asset/resource',
       },
       {
@@ -0,0 +1,53 @@
+import sys
+import time
+import tracemalloc
+from bs4 import BeautifulSoup
+from parse import parse, only
+import fetch
+
+# Compares building the whole tree with html.parser, as the crawlers used to,
+# against the targeted parse each crawler does now. Pages are read from the
+# crawler cache, so run the crawlers once (or point CRAWLER_CACHE at a saved
+# snapshot) before benchmarking. Pass a number to change the repeat count.
+navigation = only('a', {'class': 'js-navigation-open'})
+cases = [
+    ('afp', 'https://www.isa-afp.org/topics.html', only(attrs={'class': 'descr'}), None),
+    ('agda_libraries', 'https://wiki.portal.chalmers.se/agda/Main/Libraries', only('div', {'id': 'wikitext'}), None),
+    ('agda_stdlib', 'https://agda.github.io/agda-stdlib/Everything.html', only('pre'), None),
+    ('coq', 'https://coq.inria.fr/library/index.html', only('dl'), None),
+    ('fstar', 'https://github.com/FStarLang/FStar/tree/master/ulib', navigation, None),
+    ('getfol', 'https://github.com/getfol/GETFOL/tree/master/axiom', navigation, None),
+    ('hol_light', 'https://github.com/jrh13/hol-light', navigation, None),
+    ('hol_old', 'https://github.com/HOL-Theorem-Prover/HOL/tree/develop/src', navigation, None),
+    ('isabelle', 'https://isabelle.in.tum.de/dist/library/', None, None),
+    ('lean', 'https://leanprover-community.github.io/mathlib-overview.html', only('main'), None),
+    ('lean_2', 'https://leanprover-community.github.io/mathlib_docs/', only('nav', {'class': 'nav'}), None),
+    ('mm', 'http://us.metamath.org/mpeuni/mmtheorems.html', None, 'html.parser'),
+    ('pvs', 'https://github.com/nasa/pvslib', only('table'), None)
+]
+
+def measure(function, repeat):
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat, peak
+
+def main(repeat):
+    print('{:<16}{:>10}{:>12}{:>10}{:>12}{:>12}{:>10}'.format('crawler', 'size', 'full ms', 'ms', 'speedup', 'full MiB', 'MiB'))
+    for name, url, strainer, parser in cases:
+        entry = fetch.cache.lookup(url)
+        if entry is None:
+            print('{:<16}not cached'.format(name))
+            continue
+        text = entry['body'].decode(entry['encoding'] or 'utf8', errors='replace')
+        full_time, full_peak = measure(lambda: BeautifulSoup(text, 'html.parser'), repeat)
+        time_taken, peak = measure(lambda: parse(text, strainer, parser), repeat)
+        print('{:<16}{:>10}{:>12.1f}{:>10.1f}{:>11.1f}x{:>12.2f}{:>10.2f}'.format(
+            name, len(text), full_time * 1000, time_taken * 1000, full_time / time_taken, full_peak / 2 ** 20, peak / 2 ** 20))
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
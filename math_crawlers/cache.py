@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import requests
+
+# On disk cache of crawled pages. Bodies are stored with their ETag and
+# Last-Modified headers so a later crawl can revalidate them with a cheap
+# conditional request, and the least recently used pages are dropped once the
+# cache grows past its size limit. Entries are written to temporary files and
+# moved into place, the metadata last, so a crash or another crawler process
+# never leaves half an entry behind.
+class ResponseCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # Size of the cache as of the last scan plus what has been stored
+        # since, None until the first scan
+        self.total = None
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, url, extension):
+        return os.path.join(self.directory, '{}.{}'.format(hashlib.sha256(url.encode('utf8')).hexdigest(), extension))
+
+    def lookup(self, url):
+        try:
+            with open(self.path(url, 'json'), 'r') as f:
+                entry = json.load(f)
+            with open(self.path(url, 'body'), 'rb') as f:
+                entry['body'] = f.read()
+            # The access time is tracked through the metadata file's mtime
+            os.utime(self.path(url, 'json'))
+        except FileNotFoundError:
+            # Missing, or evicted while it was being read
+            return None
+        return entry
+
+    def validators(self, entry):
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url, response):
+        entry = {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'content_type': response.headers.get('Content-Type'),
+            'encoding': response.encoding,
+            'size': len(response.content)
+        }
+        metadata = json.dumps(entry).encode('utf8')
+        with self.lock:
+            replaced = self.entry_size(self.path(url, 'json'))
+            self.replace(self.path(url, 'body'), response.content)
+            self.replace(self.path(url, 'json'), metadata)
+            if self.total is None:
+                self.evict()
+            else:
+                self.total += len(response.content) + len(metadata) - replaced
+                if self.total > self.max_bytes:
+                    self.evict()
+
+    def replace(self, path, data):
+        descriptor, partial = tempfile.mkstemp(dir=self.directory, suffix='.partial')
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                f.write(data)
+            os.replace(partial, path)
+        except BaseException:
+            os.remove(partial)
+            raise
+
+    def entry_size(self, path):
+        try:
+            return os.path.getsize(path) + os.path.getsize(path[:-len('json')] + 'body')
+        except FileNotFoundError:
+            return 0
+
+    def evict(self):
+        # Scans the whole cache, so it only runs once the size kept in memory
+        # says it is over the limit
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                path = os.path.join(self.directory, name)
+                try:
+                    entries.append((os.path.getmtime(path), path, self.entry_size(path)))
+                except FileNotFoundError:
+                    # Evicted by another crawler process
+                    continue
+                total += entries[-1][2]
+        entries.sort()
+        for _, path, size in entries:
+            if total <= self.max_bytes:
+                break
+            for evicted in (path, path[:-len('json')] + 'body'):
+                try:
+                    os.remove(evicted)
+                except FileNotFoundError:
+                    pass
+            total -= size
+        self.total = total
+
+def to_response(url, entry):
+    response = requests.Response()
+    response.url = url
+    response.status_code = 200
+    response._content = entry['body']
+    response.encoding = entry['encoding']
+    if entry.get('content_type'):
+        response.headers['Content-Type'] = entry['content_type']
+    return response
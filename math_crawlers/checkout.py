@@ -0,0 +1,101 @@
+import csv
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from crawler import row
+
+# Shared by the crawlers that index a local clone of a library (ACL2 books,
+# HOL4 src). Every module is a top level directory, and each directory or
+# source file inside it becomes a row. The tree is walked with os.scandir,
+# which hands back the file type without an extra stat per entry, and the top
+# level directories are walked in parallel. The size and line count of every
+# source file is recorded on the way, so module sizes need no second walk.
+size_fieldnames = ['package', 'module', 'files', 'bytes', 'lines']
+
+def extension_matcher(extension):
+    return re.compile(r"{}$".format(extension)).search
+
+def count_lines(path):
+    lines = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            lines += chunk.count(b'\n')
+    return lines
+
+def visible(entries):
+    return [entry for entry in entries if not entry.name.startswith(".")]
+
+def scan(path):
+    with os.scandir(path) as entries:
+        return visible(entries)
+
+def source_size(entry, matches):
+    # Size of a file, or everything below a directory, counting only sources
+    if entry.is_dir(follow_symlinks=False):
+        files = 0
+        size = 0
+        lines = 0
+        for child in scan(entry.path):
+            child_files, child_size, child_lines = source_size(child, matches)
+            files += child_files
+            size += child_size
+            lines += child_lines
+        return files, size, lines
+    if entry.is_file() and matches(entry.name):
+        return 1, entry.stat().st_size, count_lines(entry.path)
+    return 0, 0, 0
+
+def index_module(module, matches, source_dir):
+    children = scan(module.path)
+    # Some libraries keep the actual sources in a subdirectory
+    root = None
+    if source_dir is not None:
+        root = next((child for child in children if child.name == source_dir and child.is_dir()), None)
+    if root is not None:
+        children = scan(root.path)
+
+    entries = []
+    for child in children:
+        is_dir = child.is_dir()
+        if is_dir or matches(child.name):
+            files, size, lines = source_size(child, matches)
+            entries.append({
+                'name': child.name,
+                'path': '{}/{}'.format(source_dir, child.name) if root is not None else child.name,
+                'is_dir': is_dir,
+                'files': files,
+                'bytes': size,
+                'lines': lines
+            })
+    return {'name': module.name, 'entries': entries}
+
+def index_tree(directory, extension, source_dir=None, workers=8):
+    matches = extension_matcher(extension)
+    modules = [entry for entry in scan(directory) if entry.is_dir()]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda module: index_module(module, matches, source_dir), modules))
+
+def write_sizes(modules, path):
+    with open(path, "w") as f:
+        writer = csv.DictWriter(f, fieldnames=size_fieldnames)
+        writer.writeheader()
+        for module in modules:
+            for entry in module['entries']:
+                writer.writerow({
+                    'package': "{}/{}".format(module['name'], entry['name']),
+                    'module': module['name'],
+                    'files': entry['files'],
+                    'bytes': entry['bytes'],
+                    'lines': entry['lines']
+                })
+
+def recurse_file(directory, repo, extension, module_to_category, subdir, source_dir=None, sizes=None):
+    modules = index_tree(directory, extension, source_dir)
+    if sizes is not None:
+        write_sizes(modules, sizes)
+
+    for module in modules:
+        for entry in module['entries']:
+            kind = 'tree' if entry['is_dir'] else 'blob'
+            url = 'https://github.com/{}/{}/master/{}/{}/{}'.format(repo, kind, subdir, module['name'], entry['path'])
+            yield row("{}/{}".format(module['name'], entry['name']), url, module_to_category[module['name']])
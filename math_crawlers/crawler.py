@@ -0,0 +1,123 @@
+import collections
+import csv
+import functools
+import glob
+import importlib
+import os
+import sys
+import time
+
+# The MSC index lives at the root of the repository, next to compile.py
+repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(repository)
+import msc_index
+
+# Every crawler registers itself here as a plugin. A plugin is a generator of
+# rows, and the same code writes the CSV whether the crawler is run on its own
+# or as part of run_all.py.
+fieldnames = ['package', 'authors', 'description', 'url', 'msc', 'verified']
+
+plugins = {}
+
+def register(name, output, fieldnames=fieldnames, checkout=False, default=True):
+    # checkout plugins crawl a local clone of the library and are given its
+    # path, along with the output directory for any extra files they write.
+    # Plugins that are not default have been replaced by a newer crawler
+    # writing the same file, and only run when asked for by name.
+    def decorator(crawl):
+        plugins[name] = {
+            'name': name,
+            'crawl': crawl,
+            'output': output,
+            'fieldnames': fieldnames,
+            'checkout': checkout,
+            'default': default
+        }
+        return crawl
+    return decorator
+
+def row(package, url, msc='', description='', authors=''):
+    return {
+        'package': package,
+        'authors': authors,
+        'description': description,
+        'url': url,
+        'msc': msc,
+        'verified': False
+    }
+
+@functools.lru_cache(maxsize=None)
+def msc_lookup():
+    with open(os.path.join(repository, 'itp_widget', 'src', 'msc.json'), 'rb') as f:
+        return msc_index.load(f.read(), os.path.join(repository, '.build_cache'))
+
+def check_categories(category_to_msc):
+    # Catches typos in the hand written category maps before they end up in
+    # the library CSVs
+    lookup = msc_lookup()
+    for category, code in category_to_msc.items():
+        if code != '' and not code.startswith('Exclude') and msc_index.normalise(code) not in lookup:
+            print('Warning: {} is mapped to {}, which is not an MSC code'.format(category, code))
+    return category_to_msc
+
+def read_categories(path):
+    with open(path, "r") as f:
+        reader = csv.DictReader(f)
+        return check_categories({package['package']: package['msc'] for package in reader})
+
+def load_plugins():
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for path in sorted(glob.glob(os.path.join(directory, 'index_*.py'))):
+        importlib.import_module(os.path.basename(path)[:-len('.py')])
+    return plugins
+
+def row_key(line, fieldnames):
+    return tuple('' if line.get(field) is None else str(line.get(field)) for field in fieldnames)
+
+def read_checkpoint(path, fieldnames):
+    # Rows are flushed as they are written, so an interrupted crawl leaves
+    # every finished row in the partial file. A row cut off half way through
+    # is dropped.
+    with open(path, "r+") as f:
+        contents = f.read()
+        if not contents.endswith('\n'):
+            contents = contents[:contents.rfind('\n') + 1]
+            f.seek(0)
+            f.write(contents)
+            f.truncate()
+    with open(path, "r") as f:
+        return collections.Counter(row_key(line, fieldnames) for line in csv.DictReader(f))
+
+def run(name, output_dir='.', checkout=None, resume=True):
+    plugin = plugins[name]
+    start = time.perf_counter()
+    rows = plugin['crawl'](checkout, output_dir) if plugin['checkout'] else plugin['crawl']()
+    count = 0
+    # Rows stream into a partial file that only replaces the last good CSV
+    # once the crawl finishes. Rerunning after a crash resumes from it, rows
+    # that were already written are skipped rather than written twice.
+    output = os.path.join(output_dir, plugin['output'])
+    partial = output + '.partial'
+    written = collections.Counter()
+    if resume and os.path.exists(partial):
+        written = read_checkpoint(partial, plugin['fieldnames'])
+        count = sum(written.values())
+    with open(partial, "a" if written else "w") as f:
+        writer = csv.DictWriter(f, fieldnames=plugin['fieldnames'])
+        if not written:
+            writer.writeheader()
+        for line in rows:
+            key = row_key(line, plugin['fieldnames'])
+            if written[key] > 0:
+                written[key] -= 1
+                continue
+            writer.writerow(line)
+            f.flush()
+            count += 1
+    os.replace(partial, output)
+    return {'name': name, 'rows': count, 'seconds': time.perf_counter() - start}
+
+def main(name):
+    # Entry point for running a single crawler as a script
+    result = run(name, checkout=sys.argv[1] if plugins[name]['checkout'] else None)
+    print('{} wrote {} rows in {:.1f}s'.format(name, result['rows'], result['seconds']))
@@ -0,0 +1,73 @@
+import collections
+import itertools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from cache import ResponseCache, to_response
+
+# Shared HTTP layer for the crawlers. One pooled session keeps connections
+# alive between requests, and a semaphore per host stops us from hammering any
+# one site when fetching pages in parallel.
+per_host = 4
+workers = 16
+timeout = 60
+
+session = requests.Session()
+adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+session.mount('http://', adapter)
+session.mount('https://', adapter)
+
+# Pages are cached on disk and revalidated on the next crawl. Point
+# CRAWLER_CACHE at a snapshot of the cache and set CRAWLER_OFFLINE=1 to crawl
+# without touching the network at all.
+cache = ResponseCache(os.environ.get('CRAWLER_CACHE', '.http_cache'), int(os.environ.get('CRAWLER_CACHE_MB', '1024')) * 1024 * 1024)
+offline = os.environ.get('CRAWLER_OFFLINE', '') not in ('', '0')
+
+host_limits = {}
+host_limits_lock = threading.Lock()
+
+def host_limit(url):
+    host = urlsplit(url).netloc
+    with host_limits_lock:
+        if host not in host_limits:
+            host_limits[host] = threading.BoundedSemaphore(per_host)
+        return host_limits[host]
+
+def get(url):
+    entry = cache.lookup(url)
+    if offline:
+        if entry is None:
+            raise LookupError('{} is not in the crawler cache'.format(url))
+        return to_response(url, entry)
+
+    headers = cache.validators(entry) if entry is not None else {}
+    with host_limit(url):
+        response = session.get(url, headers=headers, timeout=timeout)
+    if response.status_code == 304 and entry is not None:
+        return to_response(url, entry)
+    response.raise_for_status()
+    cache.store(url, response)
+    return response
+
+def get_all(urls):
+    # Results come back in the same order as the urls were given
+    urls = list(urls)
+    if len(urls) == 0:
+        return []
+    with ThreadPoolExecutor(max_workers=min(workers, len(urls))) as pool:
+        return list(pool.map(get, urls))
+
+def iter_all(urls):
+    # Like get_all, but yields each page as soon as it and every page before
+    # it have arrived, with at most workers requests in flight. A failed page
+    # raises once the pages before it have been yielded.
+    urls = iter(urls)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = collections.deque(pool.submit(get, url) for url in itertools.islice(urls, workers))
+        while pending:
+            response = pending.popleft().result()
+            pending.extend(pool.submit(get, url) for url in itertools.islice(urls, 1))
+            yield response
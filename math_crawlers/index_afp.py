@@ -1,11 +1,6 @@
-from bs4 import BeautifulSoup
-import requests
-import csv
-
-afp_source = requests.get('https://www.isa-afp.org/topics.html')
-
-
-soup = BeautifulSoup(afp_source.text, 'html.parser')
+from parse import parse, only
+import fetch
+from crawler import register, main
 
 def categories_to_string(large, small, sub):
     if small == "":
@@ -14,46 +9,57 @@ def categories_to_string(large, small, sub):
         return large + "/" + small
     else:
         return large + "/" + small + "/" + sub
-# This website is painfully formatted.
-rows = []
-all_lists = soup.find(attrs={'class':"descr"}).tbody.tr.td
-large_category = ""
-small_category = ""
-sub_category = ""
-for child in all_lists.children:
-    if child.name == 'h2':
-        large_category = child.contents[0]
-        sub_category = ""
-        small_category = ""
-
-    if child.name == 'h3':
-        small_category = child.contents[0]
-        sub_category = ""
-
-    if child.name == 'div':
-        if child['class'] == ['list']:
-            for item in child.children:
-                if item.name == 'a':
-                    print(item.contents[0])
-                    website = 'https://www.isa-afp.org/entries/{}.html'.format(item.contents[0])
-                    source = index = requests.get(website).text
-                    childSoup = BeautifulSoup(source, 'html.parser')
-                    description = " ".join(childSoup.find(attrs={'class', 'abstract'}).get_text().strip().split())
-                    authors = " ".join(childSoup.find('table', attrs={'class': 'data'}).tbody.findAll('tr')[1].findAll('td')[1].get_text().strip().split())
-                    print(authors)
-                    print(description)
-
-                    rows.append({
-                        'name': item.contents[0],
-                        'url': website,
-                        'category': categories_to_string(large_category,small_category, sub_category),
-                        'description': description,
-                        'authors': authors
-                    })
-                if item.name == 'strong':
-                    sub_category = item.contents[0][0:-1]
-print(rows)
-with open("afp_packages.csv", "w") as f:
-    writer = csv.DictWriter(f, fieldnames=['category', 'url', 'name', 'description', 'authors'])
-    writer.writeheader()
-    writer.writerows(rows)
+
+@register('afp', 'afp_packages.csv', fieldnames=['category', 'url', 'name', 'description', 'authors'])
+def crawl():
+    afp_source = fetch.get('https://www.isa-afp.org/topics.html')
+    soup = parse(afp_source.text, only(attrs={'class': 'descr'}))
+
+    # This website is painfully formatted.
+    entries = []
+    all_lists = soup.find(attrs={'class':"descr"}).tbody.tr.td
+    large_category = ""
+    small_category = ""
+    sub_category = ""
+    for child in all_lists.children:
+        if child.name == 'h2':
+            large_category = child.contents[0]
+            sub_category = ""
+            small_category = ""
+
+        if child.name == 'h3':
+            small_category = child.contents[0]
+            sub_category = ""
+
+        if child.name == 'div':
+            if child['class'] == ['list']:
+                for item in child.children:
+                    if item.name == 'a':
+                        entries.append({
+                            'name': item.contents[0],
+                            'url': 'https://www.isa-afp.org/entries/{}.html'.format(item.contents[0]),
+                            'category': categories_to_string(large_category,small_category, sub_category)
+                        })
+                    if item.name == 'strong':
+                        sub_category = item.contents[0][0:-1]
+
+    # Each row is yielded as its page arrives, so the rows before a failed
+    # page are still written
+    for entry, source in zip(entries, fetch.iter_all(entry['url'] for entry in entries)):
+        print(entry['name'])
+        childSoup = parse(source.text, only(attrs={'class': ['abstract', 'data']}))
+        description = " ".join(childSoup.find(attrs={'class', 'abstract'}).get_text().strip().split())
+        authors = " ".join(childSoup.find('table', attrs={'class': 'data'}).tbody.findAll('tr')[1].findAll('td')[1].get_text().strip().split())
+        print(authors)
+        print(description)
+
+        yield {
+            'name': entry['name'],
+            'url': entry['url'],
+            'category': entry['category'],
+            'description': description,
+            'authors': authors
+        }
+
+if __name__ == '__main__':
+    main('afp')
@@ -1,39 +1,30 @@
-from bs4 import BeautifulSoup
-import requests
-import csv
-import re
+from parse import parse, only
+import fetch
+from crawler import register, row, main
 
-source = requests.get('https://agda.github.io/agda-stdlib/Everything.html')
+@register('agda_stdlib', 'agda_std_library.csv')
+def crawl():
+    source = fetch.get('https://agda.github.io/agda-stdlib/Everything.html')
 
-soup = BeautifulSoup(source.text, 'html.parser')
+    soup = parse(source.text, only('pre'))
 
-rows = []
-categories = set()
-code = soup.find('pre')
-description = ""
-for element in code.find_all('a'):
-    print(element)
-    if element.has_attr('class') and 'Comment' in element['class']:
-        description += " " + element.get_text().strip()[3:]
-    elif element.has_attr('class') and 'Module' in element['class']:
-        module_name = element.get_text().strip() 
-        top_level_module = module_name.split(".")[0]
-        if top_level_module not in categories:
-            print("not in categories")
-            # We only include top level categories, Agda modules are very refined
-            print(element['id'])
-            rows.append({
-                'package': top_level_module,
-                'authors': '',
-                'description': description.strip(),
-                'url': 'https://agda.github.io/agda-stdlib/Everything.html#{}'.format(element['id']),
-                'msc': '',
-                'verified': False
-            })
-            categories.add(top_level_module)
-        description = ""
+    categories = set()
+    code = soup.find('pre')
+    description = ""
+    for element in code.find_all('a'):
+        print(element)
+        if element.has_attr('class') and 'Comment' in element['class']:
+            description += " " + element.get_text().strip()[3:]
+        elif element.has_attr('class') and 'Module' in element['class']:
+            module_name = element.get_text().strip() 
+            top_level_module = module_name.split(".")[0]
+            if top_level_module not in categories:
+                print("not in categories")
+                # We only include top level categories, Agda modules are very refined
+                print(element['id'])
+                yield row(top_level_module, 'https://agda.github.io/agda-stdlib/Everything.html#{}'.format(element['id']), description=description.strip())
+                categories.add(top_level_module)
+            description = ""
 
-with open("agda_std_library.csv", "w") as f:
-    writer = csv.DictWriter(f, fieldnames=['package', 'authors', 'description', 'url', 'msc', 'verified'])
-    writer.writeheader()
-    writer.writerows(rows)
+if __name__ == '__main__':
+    main('agda_stdlib')
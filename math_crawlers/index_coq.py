@@ -1,32 +1,23 @@
-from bs4 import BeautifulSoup
-import requests
-import csv
+from parse import parse, only
+import fetch
+from crawler import register, row, main
 
-coq_source = requests.get('https://coq.inria.fr/library/index.html')
+@register('coq', 'coq_library.csv')
+def crawl():
+    coq_source = fetch.get('https://coq.inria.fr/library/index.html')
 
-soup = BeautifulSoup(coq_source.text, 'html.parser')
+    soup = parse(coq_source.text, only('dl'))
 
-rows = []
-categories = set()
-all_modules = soup.find('dl')
-large_category = ""
-small_category = ""
-sub_category = ""
-for module in all_modules.find_all('dd'):
-    for theory in module.find_all('a'):
-        name = theory['href'].split(".html")[0]
-        category = ".".join(name.split('.')[:-1][:3])
-        url = "https://coq.inria.fr/library/{}".format(theory['href'])
-        categories.add(category)
+    categories = set()
+    all_modules = soup.find('dl')
+    for module in all_modules.find_all('dd'):
+        for theory in module.find_all('a'):
+            name = theory['href'].split(".html")[0]
+            category = ".".join(name.split('.')[:-1][:3])
+            categories.add(category)
 
-with open("coq_library.csv", "w") as f:
-    writer = csv.DictWriter(f, fieldnames=['package', 'authors', 'description', 'url', 'msc', 'verified'])
-    writer.writeheader()
-    writer.writerows([{
-            'package': category,
-            'authors': '',
-            'description': '',
-            'url': 'https://coq.inria.fr/library/',
-            'msc': '',
-            'verified': False
-        } for category in categories])
+    for category in categories:
+        yield row(category, 'https://coq.inria.fr/library/')
+
+if __name__ == '__main__':
+    main('coq')
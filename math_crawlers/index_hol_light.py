@@ -1,11 +1,8 @@
-from bs4 import BeautifulSoup
-import requests
-import csv
+from parse import parse, only
+import fetch
 import re
+from crawler import register, row, check_categories, main
 
-source = requests.get('https://github.com/jrh13/hol-light')
-
-soup = BeautifulSoup(source.text, 'html.parser')
 module_to_category = { '100':  ''
   , 'Arithmetic': '03F30'
   , 'Boyer_Moore': '68W32'
@@ -39,19 +36,24 @@ module_to_category = { '100':  ''
   , 'miz3': 'Exclude-Util'
   }
 
-rows = []
-categories = set()
-all_modules = soup.find('body')
-large_category = ""
-small_category = ""
-sub_category = ""
-for module in all_modules.find_all('a', {'class': 'js-navigation-open'}):
-    matches = re.match(r"/jrh13/hol-light/tree/master/([\d_\w]+(?:\.ml)?)", module['href'])
-    if matches:
-        module_name = matches.group(1)
-        print(module_name)
-        url = 'https://github.com{}'.format(module['href'])
-        child_soup = BeautifulSoup(requests.get(url).text, 'html.parser')
+@register('hol_light', 'hol_light_library.csv')
+def crawl():
+    check_categories(module_to_category)
+    source = fetch.get('https://github.com/jrh13/hol-light')
+
+    soup = parse(source.text, only('a', {'class': 'js-navigation-open'}))
+
+    module_names = []
+    module_urls = []
+    for module in soup.find_all('a', {'class': 'js-navigation-open'}):
+        matches = re.match(r"/jrh13/hol-light/tree/master/([\d_\w]+(?:\.ml)?)", module['href'])
+        if matches:
+            print(matches.group(1))
+            module_names.append(matches.group(1))
+            module_urls.append('https://github.com{}'.format(module['href']))
+
+    for module_name, child_source in zip(module_names, fetch.get_all(module_urls)):
+        child_soup = parse(child_source.text, only('a', {'class': 'js-navigation-open'}))
         for child_module in child_soup.find_all('a', {'class': 'js-navigation-open'}):
             print(child_module['href'])
             regex = r"/jrh13/hol-light/blob/master/{}/(\S+.[hm]l)".format(module_name)
@@ -60,17 +62,7 @@ for module in all_modules.find_all('a', {'class': 'js-navigation-open'}):
             if child_match:
                 name = child_match.group(1)
                 print("{}/{}".format(module_name, name))
-                rows.append({
-                    'package': "{}/{}".format(module_name, name),
-                    'authors': '',
-                    'description': '',
-                    'url': 'https://github.com{}'.format(child_module['href']),
-                    'msc': module_to_category[module_name],
-                    'verified': False
-                })
-
+                yield row("{}/{}".format(module_name, name), 'https://github.com{}'.format(child_module['href']), module_to_category[module_name])
 
-with open("hol_light_library.csv", "w") as f:
-    writer = csv.DictWriter(f, fieldnames=['package', 'authors', 'description', 'url', 'msc', 'verified'])
-    writer.writeheader()
-    writer.writerows(rows)
+if __name__ == '__main__':
+    main('hol_light')
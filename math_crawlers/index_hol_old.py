@@ -1,33 +1,21 @@
-from bs4 import BeautifulSoup
-import requests
-import csv
+from parse import parse, only
+import fetch
 import re
+from crawler import register, row, main
 
-source = requests.get('https://github.com/HOL-Theorem-Prover/HOL/tree/develop/src')
+# Superseded by index_hol.py, which indexes a local checkout of HOL4
+@register('hol_old', 'hol_library.csv', default=False)
+def crawl():
+    source = fetch.get('https://github.com/HOL-Theorem-Prover/HOL/tree/develop/src')
 
-soup = BeautifulSoup(source.text, 'html.parser')
+    soup = parse(source.text, only('a', {'class': 'js-navigation-open'}))
 
-rows = []
-categories = set()
-all_modules = soup.find('body')
-large_category = ""
-small_category = ""
-sub_category = ""
-for module in all_modules.find_all('a', {'class': 'js-navigation-open'}):
-    print(module)
-    matches = re.match(r"/HOL-Theorem-Prover/HOL/tree/develop/src/(\w+)", module['href'])
-    if matches:
-        name = matches.group(1)
-        rows.append({
-            'package': name,
-            'authors': '',
-            'description': '',
-            'url': 'https://github.com/HOL-Theorem-Prover/HOL/tree/develop/src/{}'.format(name),
-            'msc': '',
-            'verified': False
-        })
+    for module in soup.find_all('a', {'class': 'js-navigation-open'}):
+        print(module)
+        matches = re.match(r"/HOL-Theorem-Prover/HOL/tree/develop/src/(\w+)", module['href'])
+        if matches:
+            name = matches.group(1)
+            yield row(name, 'https://github.com/HOL-Theorem-Prover/HOL/tree/develop/src/{}'.format(name))
 
-with open("hol_library.csv", "w") as f:
-    writer = csv.DictWriter(f, fieldnames=['package', 'authors', 'description', 'url', 'msc', 'verified'])
-    writer.writeheader()
-    writer.writerows(rows)
+if __name__ == '__main__':
+    main('hol_old')
@@ -1,38 +1,39 @@
-from bs4 import BeautifulSoup
-import requests
-import csv
+from parse import parse, only
+import fetch
+from crawler import register, main
 
-afp_source = requests.get('https://isabelle.in.tum.de/dist/library/')
+@register('isabelle', 'isabelle_library.csv', fieldnames=['package', 'module', 'url', 'description', 'authors', 'msc', 'verified'])
+def crawl():
+    afp_source = fetch.get('https://isabelle.in.tum.de/dist/library/')
 
-soup = BeautifulSoup(afp_source.text, 'html.parser')
+    soup = parse(afp_source.text)
 
-all_lists = soup.find('body').find_all('ul', recursive=False)
-rows = []
-modules = []
-library = ""
-for sub_lists in all_lists:
-    for library in sub_lists.find('ul').find_all('li', recursive=False):
-        link = library.find('a')
-        if link is not None:
-            print(link)
-            library_name = link['href'].split('/')[0]
-            library_source = requests.get("https://isabelle.in.tum.de/dist/library/{}".format(link['href']))
-            library_soup = BeautifulSoup(library_source.text, 'html.parser')
-            for module in library_soup.find_all('dt'):
-                module_link = module.find('a')
-                module_name = "{}/{}".format(library_name,module_link.get_text())
-                module_url = "https://isabelle.in.tum.de/dist/library/{}/{}".format(library_name, module_link['href'])
-                rows.append({
-                    'package': module_name,
-                    'module': library_name,
-                    'url': module_url,
-                    'description': '',
-                    'authors': '',
-                    'msc': '00-xx',
-                    'verified': False
-                })
+    all_lists = soup.find('body').find_all('ul', recursive=False)
+    modules = []
+    library_names = []
+    for sub_lists in all_lists:
+        for library in sub_lists.find('ul').find_all('li', recursive=False):
+            link = library.find('a')
+            if link is not None:
+                print(link)
+                library_names.append(link['href'].split('/')[0])
+                modules.append("https://isabelle.in.tum.de/dist/library/{}".format(link['href']))
 
-with open("isabelle_library.csv", "w") as f:
-    writer = csv.DictWriter(f, fieldnames=['package', 'module', 'url', 'description', 'authors', 'msc', 'verified'])
-    writer.writeheader()
-    writer.writerows(rows)
+    for library_name, library_source in zip(library_names, fetch.get_all(modules)):
+        library_soup = parse(library_source.text, only('dt'))
+        for module in library_soup.find_all('dt'):
+            module_link = module.find('a')
+            module_name = "{}/{}".format(library_name,module_link.get_text())
+            module_url = "https://isabelle.in.tum.de/dist/library/{}/{}".format(library_name, module_link['href'])
+            yield {
+                'package': module_name,
+                'module': library_name,
+                'url': module_url,
+                'description': '',
+                'authors': '',
+                'msc': '00-xx',
+                'verified': False
+            }
+
+if __name__ == '__main__':
+    main('isabelle')
@@ -1,17 +1,7 @@
-from bs4 import BeautifulSoup
-import requests
-import csv
+from parse import parse, only
+import fetch
+from crawler import register, row, check_categories, main
 
-source = requests.get('https://leanprover-community.github.io/mathlib-overview.html')
-
-soup = BeautifulSoup(source.text, 'html.parser')
-
-rows = []
-categories = set()
-all_modules = soup.find('main')
-large_category = ""
-small_category = ""
-sub_category = ""
 category_to_msc = {
         'Category theory': '18-XX',
         'Numbers': '11-XX',
@@ -56,20 +46,20 @@ category_to_msc = {
         'Computability': '03Dxx',
         'Set theory': '03Exx'
         }
-for module in all_modules.find_all('p', {'class': 'ml-4'}):
-    category = module.b.get_text()
-    for theory in module.find_all('a'):
-        name = theory.get_text()
-        rows.append({
-            'package': name,
-            'authors': '',
-            'description': '',
-            'url': theory['href'],
-            'msc': category_to_msc[category] if category in category_to_msc else '',
-            'verified': False
-            })
 
-with open("lean_library.csv", "w") as f:
-    writer = csv.DictWriter(f, fieldnames=['package', 'authors', 'description', 'url', 'msc', 'verified'])
-    writer.writeheader()
-    writer.writerows(rows)
+# Superseded by index_lean_2.py, which indexes the mathlib documentation
+@register('lean_overview', 'lean_library.csv', default=False)
+def crawl():
+    check_categories(category_to_msc)
+    source = fetch.get('https://leanprover-community.github.io/mathlib-overview.html')
+
+    soup = parse(source.text, only('main'))
+
+    all_modules = soup.find('main')
+    for module in all_modules.find_all('p', {'class': 'ml-4'}):
+        category = module.b.get_text()
+        for theory in module.find_all('a'):
+            yield row(theory.get_text(), theory['href'], category_to_msc[category] if category in category_to_msc else '')
+
+if __name__ == '__main__':
+    main('lean_overview')
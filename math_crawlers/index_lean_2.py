@@ -1,13 +1,7 @@
-from bs4 import BeautifulSoup
-import requests
-import csv
+from parse import parse, only
+import fetch
 import re
-
-source = requests.get('https://leanprover-community.github.io/mathlib_docs/')
-
-soup = BeautifulSoup(source.text, 'html.parser')
-all_modules = soup.find('nav', {'class': 'nav'})
-rows = []
+from crawler import register, row, check_categories, main
 
 category_to_msc = {
         'init': 'Exclude-Util',
@@ -41,35 +35,26 @@ category_to_msc = {
         'topology': '54-XX'
         }
 
-for module in all_modules.find_all('details',recursive=False):
-    category = module['data-path']
-    print(category)
-    for submodule in module.find_all('details',recursive=False):
-        name = submodule['data-path'].replace('/','.')
-        url = submodule.find('a')['href']
-        rows.append({
-            'package': name,
-            'authors': '',
-            'description': '',
-            'url': url,
-            'msc': category_to_msc[category] if category in category_to_msc else '',
-            'verified': False
-            })
-    for theory in module.find_all('div', {'class': 'nav_link'},recursive=False):
-        url = theory.a['href']
-        match = re.match(r"https://leanprover-community.github.io/mathlib_docs/([\w_/]+).html", url)
-        if match:
-            name = match.group(1).replace("/", ".")
-            rows.append({
-                'package': name,
-                'authors': '',
-                'description': '',
-                'url': url,
-                'msc': category_to_msc[category] if category in category_to_msc else '',
-                'verified': False
-                })
-        
-with open("lean_library.csv", "w") as f:
-    writer = csv.DictWriter(f, fieldnames=['package', 'authors', 'description', 'url', 'msc', 'verified'])
-    writer.writeheader()
-    writer.writerows(rows)
+@register('lean', 'lean_library.csv')
+def crawl():
+    check_categories(category_to_msc)
+    source = fetch.get('https://leanprover-community.github.io/mathlib_docs/')
+
+    soup = parse(source.text, only('nav', {'class': 'nav'}))
+    all_modules = soup.find('nav', {'class': 'nav'})
+
+    for module in all_modules.find_all('details',recursive=False):
+        category = module['data-path']
+        print(category)
+        msc = category_to_msc[category] if category in category_to_msc else ''
+        for submodule in module.find_all('details',recursive=False):
+            name = submodule['data-path'].replace('/','.')
+            yield row(name, submodule.find('a')['href'], msc)
+        for theory in module.find_all('div', {'class': 'nav_link'},recursive=False):
+            url = theory.a['href']
+            match = re.match(r"https://leanprover-community.github.io/mathlib_docs/([\w_/]+).html", url)
+            if match:
+                yield row(match.group(1).replace("/", "."), url, msc)
+
+if __name__ == '__main__':
+    main('lean')
@@ -1,37 +1,38 @@
-from bs4 import BeautifulSoup
-import requests
-import csv
-import bibtexparser
+import re
+import fetch
+from bibtexparser.bparser import BibTexParser
 from pylatexenc.latex2text import LatexNodes2Text
+from crawler import register, row, main
 
-source = requests.get('https://fm.mizar.org/fm.bib')
-rows = []
-categories = set()
-bib_database = bibtexparser.loads(source.text)
-decoder = LatexNodes2Text()
-for entry in bib_database.entries:
-    print(entry)
-    if entry['ENTRYTYPE'].lower() == 'ARTICLE'.lower():
-        url = ""
-        if 'url' in entry:
-            url = entry['url']
-        else:
-            url = 'http://mizar.org/version/current/html/{}.html'.format(entry['ID'].lower().split(".abs")[0])
-        description = ""
-        if 'summary' in entry:
-            description = entry['summary']
-        name = entry['title']
-        authors = entry['author']
-        rows.append({
-            'package': decoder.latex_to_text(name),
-            'authors': decoder.latex_to_text(authors),
-            'description': '',
-            'url': url,
-            'msc': '',
-            'verified': False
-        })
+# Where each entry of fm.bib starts, @string macros included
+entry_start = re.compile(r'^@\w+\s*[{(]', re.MULTILINE)
 
-with open("mizar_library.csv", "w") as f:
-    writer = csv.DictWriter(f, fieldnames=['package', 'authors', 'description', 'url', 'msc', 'verified'])
-    writer.writeheader()
-    writer.writerows(rows)
+def bib_entries(text):
+    # Parses fm.bib an entry at a time and yields each one as soon as it is
+    # read. The one parser keeps the @string macros it has seen for the entries
+    # after them, and its database is emptied as each entry is yielded.
+    parser = BibTexParser()
+    parser.expect_multiple_parse = True
+    starts = [match.start() for match in entry_start.finditer(text)] + [len(text)]
+    for start, end in zip(starts, starts[1:]):
+        yield from parser.parse(text[start:end]).entries
+        parser.bib_database.entries.clear()
+
+@register('mizar', 'mizar_library.csv')
+def crawl():
+    source = fetch.get('https://fm.mizar.org/fm.bib')
+    decoder = LatexNodes2Text()
+    for entry in bib_entries(source.text):
+        print(entry)
+        if entry['ENTRYTYPE'].lower() == 'ARTICLE'.lower():
+            url = ""
+            if 'url' in entry:
+                url = entry['url']
+            else:
+                url = 'http://mizar.org/version/current/html/{}.html'.format(entry['ID'].lower().split(".abs")[0])
+            name = entry['title']
+            authors = entry['author']
+            yield row(decoder.latex_to_text(name), url, authors=decoder.latex_to_text(authors))
+
+if __name__ == '__main__':
+    main('mizar')
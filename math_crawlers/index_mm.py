@@ -1,21 +1,13 @@
-import bs4
-from bs4 import BeautifulSoup
-import requests
-import csv
+from parse import parse
+import fetch
 import re
+from crawler import register, row, read_categories, main
 
-category_to_modules = {}
-with open("./mm_categories.csv", "r") as f:
-    reader = csv.DictReader(f)
-    category_to_modules = {package['package']: package['msc'] for package in reader}
+def index_site(site, source, category_to_modules):
+    # The table of contents is inside an unclosed p tag, which lxml would
+    # close early, so this page keeps the forgiving html.parser
+    soup = parse(source.text, parser='html.parser')
 
-rows = []
-def index_site(site):
-    source = requests.get(site)
-
-    soup = BeautifulSoup(source.text, 'html.parser')
-
-    categories = set()
     # There is an unclosed p tag I need to consider
     all_modules = soup.find('p')
     category = ""
@@ -31,25 +23,18 @@ def index_site(site):
 
             if matches:
                 name = re.sub(r"\s+", " ", matches.group(1).strip())
-                url = site + module['href']
-                rows.append({
-                    'package': name,
-                    'authors': '',
-                    'description': '',
-                    'url': url,
-                    'msc': category_to_modules.get(category, ''),
-                    'verified': False
-                })
+                yield row(name, site + module['href'], category_to_modules.get(category, ''))
         if module.name == 'hr':
             print("Out TOC")
             break
 
 sites = ['http://us.metamath.org/ileuni/mmtheorems.html','http://us.metamath.org/mpeuni/mmtheorems.html', 'http://us.metamath.org/nfeuni/mmtheorems.html']
 
-for site in sites:
-    index_site(site)
+@register('mm', 'mm_library.csv')
+def crawl():
+    category_to_modules = read_categories("./mm_categories.csv")
+    for site, source in zip(sites, fetch.get_all(sites)):
+        yield from index_site(site, source, category_to_modules)
 
-with open("mm_library.csv", "w") as f:
-    writer = csv.DictWriter(f, fieldnames=['package', 'authors', 'description', 'url', 'msc', 'verified'])
-    writer.writeheader()
-    writer.writerows(rows)
+if __name__ == '__main__':
+    main('mm')
@@ -1,34 +1,21 @@
-from bs4 import BeautifulSoup
-import requests
-import csv
-import re
+from parse import parse, only
+import fetch
+from crawler import register, row, main
 
-source = requests.get('https://github.com/nasa/pvslib')
+@register('pvs', 'pvs_library.csv')
+def crawl():
+    source = fetch.get('https://github.com/nasa/pvslib')
 
-soup = BeautifulSoup(source.text, 'html.parser')
+    soup = parse(source.text, only('table'))
 
-rows = []
-categories = set()
-all_modules = soup.find('table')
-large_category = ""
-small_category = ""
-sub_category = ""
-for module in all_modules.find_all('tr'):
-    link = module.find('a')
-    if link:
-        url = link['href']
-        name = link.get_text().strip()
-        description = module.find_all('td')[1].get_text().strip()
-        rows.append({
-            'package': name,
-            'authors': '',
-            'description': description,
-            'url': 'https://github.com{}'.format(url),
-            'msc': '',
-            'verified': False
-        })
+    all_modules = soup.find('table')
+    for module in all_modules.find_all('tr'):
+        link = module.find('a')
+        if link:
+            url = link['href']
+            name = link.get_text().strip()
+            description = module.find_all('td')[1].get_text().strip()
+            yield row(name, 'https://github.com{}'.format(url), description=description)
 
-with open("pvs_library.csv", "w") as f:
-    writer = csv.DictWriter(f, fieldnames=['package', 'authors', 'description', 'url', 'msc', 'verified'])
-    writer.writeheader()
-    writer.writerows(rows)
+if __name__ == '__main__':
+    main('pvs')
@@ -1,21 +1,19 @@
 import csv
+import os
 import sys
 
-rows = {}
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from catalog import Catalog
 
-with open(sys.argv[1], "r") as f1:
-    reader = csv.DictReader(f1)
-    for line in reader:
-        rows[line['package']] = line
-
-with open(sys.argv[2], "r") as f2:
-    reader = csv.DictReader(f2)
-    for line in reader:
-        if line['package'] in rows:
-            if line['verified']:
-                rows[line['package']] = line
-
-with open(sys.argv[3], "w") as f3:
-    writer = csv.DictWriter(f3, fieldnames=['package', 'authors', 'description', 'url', 'msc', 'verified'])
-    writer.writeheader()
-    writer.writerows(list(rows.values()))
+# python merge.py OLD.csv NEW.csv OUTPUT.csv
+# Every package of OLD.csv that is verified in NEW.csv takes its row from NEW.csv
+catalog = Catalog()
+old = catalog.library_id('', sys.argv[1])
+new = catalog.library_id('', sys.argv[2])
+with open(sys.argv[1], "r", newline='') as f1:
+    catalog.load_modules(old, csv.DictReader(f1))
+with open(sys.argv[2], "r", newline='') as f2:
+    catalog.load_modules(new, csv.DictReader(f2))
+catalog.deduplicate(old, prefer_verified=False)
+catalog.merge_verified(old, new)
+catalog.write_library(old, sys.argv[3], ['package', 'authors', 'description', 'url', 'msc', 'verified'])
@@ -0,0 +1,105 @@
+import argparse
+import csv
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from checkout import index_tree
+
+# Regenerates itp_widget/src/module_size.csv. A library can be divided into
+# "small" modules (its top level directories) or "large" ones (everything one
+# level below). Whichever division has an average module size closest to the
+# target, measured on a log scale, is the one the library uses.
+#
+#   python module_sizes.py --sizes "ACL2,Community Books=acl2_module_sizes.csv" \
+#       --checkout "Coq,Standard Library=~/coq/theories:v"
+target = 1500
+fieldnames = ['name', 'section', 'total', 'small_average', 'small_median', 'large_average', 'large_median', 'small_distance', 'large_distance', 'choice']
+
+def read_sizes(path, measure):
+    # Streams a *_module_sizes.csv into the module of every package and its size
+    modules = []
+    sizes = []
+    with open(path, "r") as f:
+        for line in csv.DictReader(f):
+            modules.append(line['module'])
+            sizes.append(int(line[measure]))
+    return modules, np.array(sizes, dtype=np.int64)
+
+def checkout_sizes(spec, measure):
+    # PATH:EXTENSION[:SOURCE_DIR]
+    parts = spec.split(':')
+    modules = []
+    sizes = []
+    for module in index_tree(os.path.expanduser(parts[0]), parts[1], parts[2] if len(parts) > 2 else None):
+        for entry in module['entries']:
+            modules.append(module['name'])
+            sizes.append(entry[measure])
+    return modules, np.array(sizes, dtype=np.int64)
+
+def distance(average):
+    if math.isnan(average) or average <= 0:
+        return math.nan
+    return abs(math.log(average) - math.log(target))
+
+def number(value):
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+def statistics(modules, sizes):
+    # Small modules are the sums over each top level module, large modules the
+    # packages themselves
+    _, module_index = np.unique(np.array(modules), return_inverse=True)
+    small = np.bincount(module_index, weights=sizes) if len(sizes) else np.array([])
+    large = sizes
+    result = {'total': int(sizes.sum())}
+    for name, values in [('small', small), ('large', large)]:
+        average = float(values.mean()) if len(values) else math.nan
+        result['{}_average'.format(name)] = average
+        result['{}_median'.format(name)] = number(np.median(values)) if len(values) else math.nan
+        result['{}_distance'.format(name)] = distance(average)
+    if math.isnan(result['large_distance']) or result['small_distance'] <= result['large_distance']:
+        result['choice'] = 'small'
+    else:
+        result['choice'] = 'large'
+    return result
+
+def compute(library, kind, source, measure):
+    name, section = library.split(',', 1)
+    modules, sizes = read_sizes(source, measure) if kind == 'sizes' else checkout_sizes(source, measure)
+    result = statistics(modules, sizes)
+    result['name'] = name
+    result['section'] = section
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute module_size.csv from crawled module sizes')
+    parser.add_argument('--sizes', action='append', default=[], metavar='ITP,SECTION=CSV', help='a module sizes CSV written by a checkout crawler')
+    parser.add_argument('--checkout', action='append', default=[], metavar='ITP,SECTION=PATH:EXTENSION[:SOURCE_DIR]', help='a local clone to measure directly')
+    parser.add_argument('--measure', default='lines', choices=['lines', 'bytes'])
+    parser.add_argument('--output', default='../itp_widget/src/module_size.csv')
+    args = parser.parse_args()
+
+    jobs = [(spec.split('=', 1), 'sizes') for spec in args.sizes] + [(spec.split('=', 1), 'checkout') for spec in args.checkout]
+    with ProcessPoolExecutor() as pool:
+        futures = [pool.submit(compute, library, kind, source, args.measure) for (library, source), kind in jobs]
+        results = {(result['name'], result['section']): result for result in (future.result() for future in futures)}
+
+    # Libraries that were not measured this time keep their previous figures
+    rows = []
+    if os.path.exists(args.output):
+        with open(args.output, "r") as f:
+            rows = list(csv.DictReader(f))
+    for i, line in enumerate(rows):
+        rows[i] = results.pop((line['name'], line['section']), line)
+    rows.extend(results.values())
+
+    with open(args.output, "w") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(rows)
+    for line in rows:
+        print('{} {}: {}'.format(line['name'], line['section'], line['choice']))
+
+if __name__ == '__main__':
+    main()
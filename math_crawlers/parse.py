@@ -0,0 +1,30 @@
+from bs4 import BeautifulSoup, SoupStrainer
+
+# HTML parsing for the crawlers. lxml is much faster than the pure Python
+# html.parser, and most crawlers only need one part of a page, so only that
+# part is turned into a tree.
+try:
+    import lxml
+    default_parser = 'lxml'
+except ImportError:
+    default_parser = 'html.parser'
+
+def has_class(names):
+    names = {names} if isinstance(names, str) else set(names)
+    def match(value):
+        if value is None:
+            return False
+        values = value.split() if isinstance(value, str) else value
+        return any(v in names for v in values)
+    return match
+
+def only(name=None, attrs={}):
+    # While parsing, the strainer sees class as one unsplit string, so match
+    # it the way find_all would
+    attrs = dict(attrs)
+    if 'class' in attrs:
+        attrs['class'] = has_class(attrs['class'])
+    return SoupStrainer(name, attrs)
+
+def parse(text, strainer=None, parser=None):
+    return BeautifulSoup(text, parser or default_parser, parse_only=strainer)
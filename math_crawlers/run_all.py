@@ -0,0 +1,63 @@
+import argparse
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import crawler
+
+# Runs every registered crawler at once, so refreshing the whole dataset takes
+# about as long as the slowest crawler rather than all of them added up.
+#
+#   python run_all.py --output ../itp_widget/src/library_data --checkout acl2=~/acl2/books --checkout hol=~/HOL/src
+
+def run_plugin(name, output_dir, checkout, resume):
+    crawler.load_plugins()
+    try:
+        return crawler.run(name, output_dir, checkout, resume)
+    except Exception:
+        return {'name': name, 'error': traceback.format_exc()}
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the library crawlers in parallel')
+    parser.add_argument('plugins', nargs='*', help='crawlers to run, defaults to all of the current ones')
+    parser.add_argument('--output', default='.', help='directory to write the library CSVs to')
+    parser.add_argument('--checkout', action='append', default=[], metavar='NAME=PATH', help='local clone for a checkout crawler')
+    parser.add_argument('--restart', action='store_true', help='ignore rows left behind by an interrupted crawl')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    plugins = crawler.load_plugins()
+    checkouts = dict(checkout.split('=', 1) for checkout in args.checkout)
+    names = args.plugins or [name for name, plugin in plugins.items() if plugin['default']]
+    skipped = [name for name in names if plugins[name]['checkout'] and name not in checkouts]
+    names = [name for name in names if name not in skipped]
+    for name in skipped:
+        print('Skipping {}, it needs --checkout {}=PATH'.format(name, name))
+
+    os.makedirs(args.output, exist_ok=True)
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers or len(names) or 1) as pool:
+        futures = [pool.submit(run_plugin, name, args.output, os.path.expanduser(checkouts[name]) if name in checkouts else None, not args.restart) for name in names]
+        for future in as_completed(futures):
+            results.append(future.result())
+
+    print()
+    print('{:<16}{:>8}{:>10}'.format('crawler', 'rows', 'seconds'))
+    for result in sorted(results, key=lambda x: x['name']):
+        if 'error' in result:
+            print('{:<16}{:>8}'.format(result['name'], 'failed'))
+        else:
+            print('{:<16}{:>8}{:>10.1f}'.format(result['name'], result['rows'], result['seconds']))
+    print('{:<16}{:>8}{:>10.1f}'.format('total', '', time.perf_counter() - start))
+
+    failures = [result for result in results if 'error' in result]
+    for result in failures:
+        print()
+        print('{} failed:'.format(result['name']))
+        print(result['error'])
+    if failures:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
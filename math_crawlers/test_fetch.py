@@ -0,0 +1,119 @@
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+
+# fetch.py opens its cache when it is imported, keep it out of the checkout
+os.environ.setdefault('CRAWLER_CACHE', tempfile.mkdtemp())
+import fetch
+from cache import ResponseCache
+
+# A local server standing in for the sites the crawlers fetch from:
+#   /slow/<i>           answers <i> after a moment, counting requests in flight
+#   /delay/<ms>/<i>     answers <i> after <ms> milliseconds
+#   /status/<code>      answers with that status
+#   /etag/<i>           answers <i> with an ETag, and 304 when it is sent back
+class Handler(BaseHTTPRequestHandler):
+    lock = threading.Lock()
+    in_flight = 0
+    most_in_flight = 0
+    not_modified = 0
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body=b'', headers={}):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parts = self.path.strip('/').split('/')
+        if parts[0] == 'slow':
+            with Handler.lock:
+                Handler.in_flight += 1
+                Handler.most_in_flight = max(Handler.most_in_flight, Handler.in_flight)
+            time.sleep(0.1)
+            with Handler.lock:
+                Handler.in_flight -= 1
+            self.reply(200, parts[1].encode('utf8'))
+        elif parts[0] == 'delay':
+            time.sleep(int(parts[1]) / 1000)
+            self.reply(200, parts[2].encode('utf8'))
+        elif parts[0] == 'status':
+            self.reply(int(parts[1]), b'failed')
+        elif parts[0] == 'etag':
+            tag = '"{}"'.format(parts[1])
+            if self.headers.get('If-None-Match') == tag:
+                with Handler.lock:
+                    Handler.not_modified += 1
+                self.reply(304)
+            else:
+                self.reply(200, parts[1].encode('utf8'), {'ETag': tag, 'Content-Type': 'text/plain'})
+        else:
+            self.reply(404)
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    Handler.in_flight = Handler.most_in_flight = Handler.not_modified = 0
+    monkeypatch.setattr(fetch, 'cache', ResponseCache(str(tmp_path / 'cache'), 1 << 20))
+    monkeypatch.setattr(fetch, 'offline', False)
+    monkeypatch.setattr(fetch, 'host_limits', {})
+    yield 'http://127.0.0.1:{}'.format(httpd.server_address[1])
+    httpd.shutdown()
+    httpd.server_close()
+
+def test_per_host_limit(server, monkeypatch):
+    monkeypatch.setattr(fetch, 'per_host', 2)
+    responses = fetch.get_all('{}/slow/{}'.format(server, i) for i in range(8))
+    assert [response.text for response in responses] == [str(i) for i in range(8)]
+    assert Handler.most_in_flight == 2
+
+def test_get_all_keeps_order(server):
+    # The first pages answer last
+    urls = ['{}/delay/{}/{}'.format(server, 50 * (5 - i), i) for i in range(6)]
+    assert [response.text for response in fetch.get_all(urls)] == [str(i) for i in range(6)]
+
+def test_errors_propagate(server):
+    with pytest.raises(requests.HTTPError):
+        fetch.get('{}/status/500'.format(server))
+    with pytest.raises(requests.HTTPError):
+        fetch.get_all(['{}/delay/0/0'.format(server), '{}/status/404'.format(server)])
+    # A failed page is not cached
+    assert fetch.cache.lookup('{}/status/500'.format(server)) is None
+
+def test_revalidates_through_cache(server):
+    url = '{}/etag/page'.format(server)
+    assert fetch.get(url).text == 'page'
+    assert Handler.not_modified == 0
+    response = fetch.get(url)
+    assert Handler.not_modified == 1
+    assert response.status_code == 200
+    assert response.text == 'page'
+    assert response.headers['Content-Type'] == 'text/plain'
+
+def test_offline_uses_cache_only(server, monkeypatch):
+    url = '{}/etag/kept'.format(server)
+    fetch.get(url)
+    monkeypatch.setattr(fetch, 'offline', True)
+    assert fetch.get(url).text == 'kept'
+    with pytest.raises(LookupError):
+        fetch.get('{}/etag/missing'.format(server))
+
+def test_iter_all_streams_in_order(server, monkeypatch):
+    monkeypatch.setattr(fetch, 'workers', 3)
+    urls = ['{}/delay/{}/{}'.format(server, 20 * (i % 3), i) for i in range(10)]
+    assert [response.text for response in fetch.iter_all(urls)] == [str(i) for i in range(10)]
+    pages = fetch.iter_all(['{}/delay/0/0'.format(server), '{}/status/500'.format(server), '{}/delay/0/2'.format(server)])
+    assert next(pages).text == '0'
+    with pytest.raises(requests.HTTPError):
+        next(pages)
@@ -0,0 +1,101 @@
+import bisect
+import hashlib
+import itertools
+import json
+import os
+import re
+import profiling
+
+# A compact index of the Mathematics Subject Classification. msc.json is a
+# deep tree of dicts, this flattens it into two parallel arrays sorted by code
+# so that a name lookup, or finding every code under a prefix, is a binary
+# search. The arrays are saved next to the build cache, keyed by a hash of
+# msc.json, so the tree only has to be walked when it changes.
+
+def removeBrackets(text):
+    no_brackets = re.sub(r"\[[^\[\]]+\]", "", text)
+    no_braces = re.sub(r"\{[^\{\}]+\}", "", no_brackets)
+    return no_braces
+
+def prefix_range(values, prefix):
+    # All strings starting with prefix sort between prefix and prefix + U+FFFF
+    return bisect.bisect_left(values, prefix), bisect.bisect_left(values, prefix + '\uffff')
+
+def normalise(code):
+    # The crawlers' category maps sometimes write 51-xx for 51-XX
+    if code[2:].lower() == '-xx':
+        return code[:2] + '-XX'
+    return code
+
+class MscIndex:
+    def __init__(self, codes, names):
+        self.codes = codes
+        self.names = names
+
+    @classmethod
+    def from_tree(cls, msc):
+        lookup = {}
+        for top_level in msc:
+            lookup[top_level['code']] = removeBrackets(top_level['short_name'])
+            for subclass in top_level['subclassifications']:
+                lookup[subclass['code']] = removeBrackets(subclass['name'])
+
+                for botclass in subclass['classifications']:
+                    lookup[botclass['code']] = removeBrackets(botclass['name'])
+
+            for botclass in top_level['classifications']:
+                lookup[botclass['code']] = removeBrackets(botclass['name'])
+        codes = sorted(lookup)
+        return cls(codes, [lookup[code] for code in codes])
+
+    def position(self, code):
+        i = bisect.bisect_left(self.codes, code)
+        if i < len(self.codes) and self.codes[i] == code:
+            return i
+        return None
+
+    def __contains__(self, code):
+        return self.position(code) is not None
+
+    def __getitem__(self, code):
+        i = self.position(code)
+        if i is None:
+            raise KeyError(code)
+        return self.names[i]
+
+    def get(self, code, default=None):
+        i = self.position(code)
+        return default if i is None else self.names[i]
+
+    def under(self, prefix):
+        start, end = prefix_range(self.codes, prefix)
+        return self.codes[start:end]
+
+@profiling.stage('msc')
+def load(source, cache_dir='.build_cache'):
+    # source is the raw bytes of msc.json
+    path = os.path.join(cache_dir, 'msc-{}.json'.format(hashlib.sha256(source).hexdigest()))
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            arrays = json.load(f)
+        return MscIndex(arrays['codes'], arrays['names'])
+    index = MscIndex.from_tree(json.loads(source))
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'codes': index.codes, 'names': index.names}, f)
+    return index
+
+class CodeCounts:
+    # Counts how many codes fall under a prefix without a scan. counts maps
+    # each code to how many times it occurs.
+    def __init__(self, counts):
+        self.codes = sorted(counts)
+        self.cumulative = list(itertools.accumulate((counts[code] for code in self.codes), initial=0))
+
+    def prefix(self, prefix):
+        start, end = prefix_range(self.codes, prefix)
+        return self.cumulative[end] - self.cumulative[start]
+
+    def exact(self, code):
+        start, end = bisect.bisect_left(self.codes, code), bisect.bisect_right(self.codes, code)
+        return self.cumulative[end] - self.cumulative[start]
@@ -0,0 +1,155 @@
+import importlib
+import os
+import signal
+import subprocess
+import sys
+import time
+import bibliography
+import build
+import compile
+import dataset
+import msc_index
+import profiling
+import shards
+import snapshot
+
+# A long running preview build. The parsed data stays in memory between
+# saves, and only the stages after the earliest one affected by a change are
+# run again.
+stages = ['code', 'data', 'render', 'pandoc']
+
+watched = {
+    'compile.py': 'code',
+    'build.py': 'code',
+    'bibliography.py': 'code',
+    'profiling.py': 'code',
+    'msc_index.py': 'code',
+    'dataset.py': 'code',
+    'snapshot.py': 'code',
+    'shards.py': 'pandoc',
+    'results/all_data.zip': 'data',
+    'results/library_stats.csv': 'data',
+    'results/classification.csv': 'data',
+    'index.md': 'render',
+    'mytemplate.md': 'pandoc',
+    'mytemplate.tex': 'pandoc',
+    'References.bib': 'pandoc',
+    'acm.csl': 'pandoc'
+}
+
+def modified_time(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def earliest(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return stages[min(stages.index(a), stages.index(b))]
+
+class Preview:
+    def __init__(self, target, debounce=0.3, interval=0.1):
+        self.target = target
+        self.debounce = debounce
+        self.interval = interval
+        self.times = {path: modified_time(path) for path in watched}
+        self.data = None
+        self.process = None
+        self.output = None
+        self.failed = None
+
+    def changes(self):
+        stage = None
+        for path in watched:
+            current = modified_time(path)
+            if current != self.times[path]:
+                self.times[path] = current
+                stage = earliest(stage, watched[path])
+        return stage
+
+    def settle(self, stage):
+        # Editors often write a file several times per save, so wait until
+        # things have been quiet for a moment and build everything at once
+        while True:
+            time.sleep(self.debounce)
+            newer = self.changes()
+            if newer is None:
+                return stage
+            stage = earliest(stage, newer)
+
+    def cancel(self):
+        if self.process is not None and self.process.poll() is None:
+            print("Cancelling stale build")
+            # shards.py runs pandoc itself, stop those along with it
+            os.killpg(self.process.pid, signal.SIGTERM)
+            self.process.wait()
+        self.process = None
+
+    def start(self, stage):
+        if stage == 'code':
+            # Dependencies first, build.py last as it copies the pandoc
+            # arguments and targets out of compile.py when it is loaded
+            importlib.reload(profiling)
+            importlib.reload(bibliography)
+            importlib.reload(msc_index)
+            importlib.reload(dataset)
+            importlib.reload(snapshot)
+            importlib.reload(compile)
+            importlib.reload(shards)
+            importlib.reload(build)
+        if stage in ('code', 'data') or self.data is None:
+            print("Loading data")
+            self.data = compile.load_data()
+        if stage != 'pandoc' or not os.path.exists(compile.targets[self.target]):
+            print("Creating Template")
+            with open(compile.targets[self.target], "w") as out:
+                out.write(compile.render(self.data, self.target))
+
+        source = compile.targets[self.target]
+        path = build.cache_path('pandoc', build.pandoc_key(source, self.target), build.outputs[self.target].split('.')[-1])
+        if os.path.exists(path):
+            build.copy_if_changed(path, build.outputs[self.target])
+            print("{} is up to date".format(build.outputs[self.target]))
+        else:
+            print("Recompiling")
+            self.output = path
+            # The same chapter by chapter pandoc run as build.py, which shares
+            # this cache, in a process of its own so a stale one can be stopped
+            args = bibliography.with_bibliography(build.pandoc_args[self.target], bibliography.prune(source))
+            self.process = subprocess.Popen([sys.executable, 'shards.py', source, build.partial_path(path)] + args, start_new_session=True)
+
+    def finish(self):
+        if self.process is not None and self.process.poll() is not None:
+            if self.process.returncode == 0:
+                os.replace(build.partial_path(self.output), self.output)
+                build.copy_if_changed(self.output, build.outputs[self.target])
+                print("Built {}".format(build.outputs[self.target]))
+            else:
+                print("pandoc failed with exit code {}".format(self.process.returncode))
+            self.process = None
+
+    def rebuild(self, stage):
+        self.cancel()
+        try:
+            self.start(stage)
+            self.failed = None
+        except Exception as e:
+            # Keep the preview running, the next save will try again
+            print("Build failed: {}".format(e))
+            self.failed = stage
+
+    def run(self):
+        os.makedirs(build.cache_dir, exist_ok=True)
+        self.rebuild('code')
+        while True:
+            stage = self.changes()
+            if stage is not None:
+                self.rebuild(earliest(self.settle(stage), self.failed))
+            self.finish()
+            time.sleep(self.interval)
+
+if __name__ == '__main__':
+    Preview(sys.argv[1] if len(sys.argv) > 1 else 'html').run()
@@ -0,0 +1,120 @@
+import atexit
+import contextlib
+import cProfile
+import datetime
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+# Where the build spends its time. With BUILD_TRACE set, every stage records
+# its wall time, CPU time (its own and that of the pandoc processes it ran)
+# and the process's maximum RSS, and the stages are written to that file as
+# JSON when the build exits. BUILD_TRACE_MEMORY also traces Python
+# allocations for the peak memory of each stage, which makes the build several
+# times slower. BUILD_PROFILE additionally writes a cProfile dump of the whole
+# run, which flameprof or snakeviz turn into a flamegraph.
+#
+#   BUILD_TRACE=trace.json BUILD_PROFILE=build.prof python build.py all
+trace_path = os.environ.get('BUILD_TRACE')
+trace_memory = bool(trace_path and os.environ.get('BUILD_TRACE_MEMORY'))
+profile_path = os.environ.get('BUILD_PROFILE')
+
+records = []
+lock = threading.Lock()
+local = threading.local()
+profiler = None
+origin = time.perf_counter()
+
+def max_rss():
+    # Kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def children_cpu():
+    times = os.times()
+    return times.children_user + times.children_system
+
+@contextlib.contextmanager
+def stage(name, **details):
+    if not trace_path:
+        yield
+        return
+    # The CPU time of child processes and the tracemalloc peak belong to the
+    # whole process. Stages run in worker threads overlap, so they only record
+    # their own thread's CPU time and leave the rest to the stage around the
+    # pool.
+    main = threading.current_thread() is threading.main_thread()
+    memory = trace_memory and main
+    # tracemalloc only keeps one peak, so each stage resets it and hands its
+    # own peak up to the stage it is part of
+    frames = local.__dict__.setdefault('frames', [])
+    if memory:
+        if frames:
+            frames[-1]['peak'] = max(frames[-1]['peak'], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+    frame = {'peak': 0}
+    frames.append(frame)
+    wall = time.perf_counter()
+    cpu = time.process_time() if main else time.thread_time()
+    children = children_cpu()
+    try:
+        yield
+    finally:
+        frames.pop()
+        record = dict(details)
+        record.update({
+            'name': name,
+            'depth': len(frames),
+            'start': wall - origin,
+            'wall': time.perf_counter() - wall,
+            'cpu': (time.process_time() if main else time.thread_time()) - cpu,
+            'max_rss_kb': max_rss()
+        })
+        if main:
+            record['children_cpu'] = children_cpu() - children
+        if memory:
+            peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+            if frames:
+                frames[-1]['peak'] = max(frames[-1]['peak'], peak)
+            record['peak_memory'] = peak
+        with lock:
+            records.append(record)
+
+def commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def start():
+    # Called once by each entry point
+    global profiler
+    if trace_memory:
+        tracemalloc.start()
+    if trace_path:
+        atexit.register(write)
+    if profile_path:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        atexit.register(dump_profile)
+
+def dump_profile():
+    profiler.disable()
+    profiler.dump_stats(profile_path)
+
+def write():
+    with open(trace_path, 'w') as f:
+        json.dump({
+            'commit': commit(),
+            'argv': sys.argv,
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'wall': time.perf_counter() - origin,
+            'cpu': time.process_time(),
+            'children_cpu': children_cpu(),
+            'max_rss_kb': max_rss(),
+            'stages': sorted(records, key=lambda x: x['start'])
+        }, f, indent=2)
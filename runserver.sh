@@ -1,10 +1,2 @@
 #!/usr/bin/env bash
-inotifywait -e close_write -m . |
-while read -r directory events filename; do
-  if [ "$filename" = "compile.py" ]; then
-    ./buildweb.sh
-  fi
-  if [ "$filename" = "index.md" ]; then
-    ./buildweb.sh
-  fi
-done
+exec python preview.py html
@@ -0,0 +1,341 @@
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import profiling
+
+# pandoc over the thesis a chapter at a time. The rendered markdown is split at
+# every top level heading and each chapter is read into pandoc's JSON AST on
+# its own, in parallel, with the filters that only look at one chapter. The
+# headings are then given the identifiers pandoc gives them reading the whole
+# thesis. pandoc-crossref and citeproc also run a chapter at a time, with
+# stubs of the other chapters around it: their headings, labelled figures,
+# tables, listings and equations, and citations. Numbers and references come
+# out as in a single run. Every step is cached by a hash of its input, so
+# editing a chapter only reads and processes that chapter again, unless it
+# changes what the other chapters see of it. The chapters are then joined back
+# into one document and a last pass applies the template.
+cache_dir = '.build_cache'
+
+# Filters that can run on a chapter without seeing the rest of the thesis
+shard_filters = ['pandoc-csv2table']
+
+# The identifiers pandoc-crossref numbers start with one of these
+crossref_prefixes = ['fig', 'tbl', 'lst', 'eq', 'sec']
+# A crossref label in a block's JSON, as an identifier or still as {#eq:...}
+# text after an equation or table caption
+crossref_label = re.compile(r'\["(?:{0}):|\{{#(?:{0}):'.format('|'.join(crossref_prefixes)))
+
+# The output format pandoc guesses from the extension, for the filters
+formats = {'.html': 'html', '.tex': 'latex', '.pdf': 'latex'}
+
+code_fence = re.compile(r'^(`{3,}|~{3,})')
+div_fence = re.compile(r'^:{3,}(.*)$')
+
+def split(markdown):
+    # The front matter and everything before the first chapter is the first
+    # shard. Headings inside code blocks and fenced divs are not chapters, and
+    # neither is one without a blank line before it, pandoc reads that as part
+    # of the paragraph above.
+    shards = [[]]
+    fence = None
+    divs = 0
+    previous = ''
+    for line in markdown.splitlines(keepends=True):
+        match = code_fence.match(line)
+        if fence is not None:
+            if match and match.group(1)[0] == fence[0] and len(match.group(1)) >= len(fence) and not line[len(match.group(1)):].strip():
+                fence = None
+        elif match:
+            fence = match.group(1)
+        elif div_fence.match(line):
+            divs = divs + 1 if div_fence.match(line).group(1).strip() else max(divs - 1, 0)
+        elif divs == 0 and line.startswith('# ') and not previous.strip() and shards[-1]:
+            shards.append([])
+        shards[-1].append(line)
+        previous = line
+    return [''.join(shard) for shard in shards]
+
+def split_args(args):
+    # Reader options and per chapter filters for reading the shards, the
+    # filters and citeproc options for processing them, and the rest for the
+    # last pass. The shards are read without automatic identifiers, those are
+    # given once all of them are read.
+    reader = []
+    process = []
+    writer = []
+    i = 0
+    while i < len(args):
+        if args[i] in ('--from', '-f'):
+            reader += [args[i], args[i + 1] + '-auto_identifiers']
+            i += 2
+        elif args[i] in ('-M', '--metadata', '--metadata-file'):
+            reader += args[i:i + 2]
+            i += 2
+        elif args[i] in ('-F', '--filter'):
+            (reader if args[i + 1] in shard_filters else process).extend(args[i:i + 2])
+            i += 2
+        elif args[i] in ('--bibliography', '--csl'):
+            process += args[i:i + 2]
+            i += 2
+        elif args[i] in ('-C', '--citeproc'):
+            process.append(args[i])
+            i += 1
+        else:
+            writer.append(args[i])
+            i += 1
+    return reader, process, writer
+
+def output_format(writer, output):
+    for i in range(len(writer) - 1):
+        if writer[i] in ('--to', '-t', '--write', '-w'):
+            return re.split(r'[+-]', writer[i + 1])[0]
+    return formats.get(os.path.splitext(output)[1], 'html')
+
+def run_step(command, data=None):
+    # One pandoc or filter run. Its messages are passed on, and kept on the
+    # error when it fails so compile.py can report them.
+    result = subprocess.run(command, input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr = result.stderr.decode('utf8', 'replace')
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(result.returncode, command, result.stdout, stderr)
+    sys.stderr.write(stderr)
+    return result.stdout
+
+def cache_path(kind, *parts):
+    hasher = hashlib.sha256()
+    for part in parts:
+        hasher.update(part if isinstance(part, bytes) else part.encode('utf8'))
+    return os.path.join(cache_dir, '{}-{}.json'.format(kind, hasher.hexdigest()))
+
+def write_cached(path, data):
+    # Both targets can need the same shard at once, each writes a partial file
+    # of its own and moves it into place
+    fd, partial = tempfile.mkstemp(dir=cache_dir, suffix='.partial')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(partial, path)
+
+def read_shard(reader, text):
+    path = cache_path('shard', json.dumps(reader), text)
+    with profiling.stage('pandoc:shard', cached=os.path.exists(path), length=len(text)):
+        if not os.path.exists(path):
+            write_cached(path, run_step(['pandoc'] + reader + ['--to', 'json'], text.encode('utf8')))
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def nodes(node):
+    # Every element under node in document order, citations included
+    if isinstance(node, list):
+        for item in node:
+            yield from nodes(item)
+    elif isinstance(node, dict):
+        yield node
+        for value in node.values():
+            yield from nodes(value)
+
+def headers(blocks):
+    # Every header in document order, including those nested in divs and lists
+    for block in blocks:
+        if block['t'] == 'Header':
+            yield block
+        elif block['t'] == 'Div':
+            yield from headers(block['c'][1])
+        elif block['t'] == 'BlockQuote':
+            yield from headers(block['c'])
+        elif block['t'] in ('BulletList', 'OrderedList'):
+            for item in block['c'] if block['t'] == 'BulletList' else block['c'][1]:
+                yield from headers(item)
+
+def stringify(inlines):
+    # The plain text of some inlines, as pandoc's stringify gives it
+    text = []
+    for inline in inlines:
+        if inline['t'] == 'Str':
+            text.append(inline['c'])
+        elif inline['t'] in ('Space', 'SoftBreak', 'LineBreak'):
+            text.append(' ')
+        elif inline['t'] in ('Code', 'Math'):
+            text.append(inline['c'][1])
+        elif inline['t'] in ('Emph', 'Underline', 'Strong', 'Strikeout', 'Superscript', 'Subscript', 'SmallCaps'):
+            text.append(stringify(inline['c']))
+        elif inline['t'] in ('Quoted', 'Cite', 'Link', 'Image', 'Span'):
+            text.append(stringify(inline['c'][1]))
+    return ''.join(text)
+
+def identifier(inlines):
+    # pandoc's identifier for a heading: its text in lower case with only
+    # letters, digits, spaces and _-. kept, the words joined by - and anything
+    # before the first letter dropped
+    words = ''.join(c for c in stringify(inlines).lower() if c.isalnum() or c.isspace() or c in '_-.').split()
+    text = '-'.join(words)
+    while text and not text[0].isalpha():
+        text = text[1:]
+    return text or 'section'
+
+def unique_identifier(base, used):
+    # The same numbering pandoc gives repeated headings
+    if base not in used:
+        return base
+    n = 1
+    while '{}-{}'.format(base, n) in used:
+        n += 1
+    return '{}-{}'.format(base, n)
+
+def assign_identifiers(documents):
+    # Headings without an explicit identifier are numbered in document order
+    # across every shard, taking the explicit ones as they come, just as pandoc
+    # does reading the whole thesis. A [Heading] link was read with an empty
+    # target, like pandoc it points at the first heading with that text. One
+    # to a heading in another chapter is not a link when its chapter is read.
+    used = set()
+    texts = {}
+    for document in documents:
+        for header in headers(document['blocks']):
+            attr = header['c'][1]
+            if attr[0] == '':
+                attr[0] = unique_identifier(identifier(header['c'][2]), used)
+            used.add(attr[0])
+            texts.setdefault(stringify(header['c'][2]), attr[0])
+    for node in nodes([document['blocks'] for document in documents]):
+        if node.get('t') == 'Link' and node['c'][2][0] == '#' and stringify(node['c'][1]) in texts:
+            node['c'][2][0] = '#' + texts[stringify(node['c'][1])]
+
+def references(node):
+    # The headings and citations of the bibliography under node, in order
+    if isinstance(node, list):
+        for item in node:
+            yield from references(item)
+    elif isinstance(node, dict):
+        if node.get('t') == 'Header':
+            yield node
+        elif node.get('t') == 'Cite':
+            if any(citation['citationId'].split(':')[0] not in crossref_prefixes for citation in node['c'][0]):
+                yield {'t': 'Para', 'c': [node]}
+        else:
+            yield from references(node.get('c'))
+
+def stubs(blocks):
+    # What the other shards need to see of this one: blocks with a crossref
+    # label whole, and otherwise just their headings and citations
+    for block in blocks:
+        if crossref_label.search(json.dumps(block)):
+            yield block
+        else:
+            yield from references(block)
+
+def context(blocks):
+    return [{'t': 'Div', 'c': [['', ['shard-context'], []], blocks]}] if blocks else []
+
+def is_context(block):
+    return block['t'] == 'Div' and 'shard-context' in block['c'][0][1]
+
+def process_commands(process, format):
+    # pandoc runs the filters and citeproc in the order they are given. The
+    # filters are run directly, through pandoc they would be told the output
+    # format is json.
+    options = []
+    steps = []
+    i = 0
+    while i < len(process):
+        if process[i] in ('-C', '--citeproc'):
+            steps.append(None)
+            i += 1
+        elif process[i] in ('-F', '--filter'):
+            steps.append(process[i + 1])
+            i += 2
+        else:
+            options += process[i:i + 2]
+            i += 2
+    commands = [[step, format] if step else ['pandoc', '--from', 'json', '--citeproc'] + options + ['--to', 'json'] for step in steps]
+    return commands, options
+
+def meta_text(value):
+    if value is None:
+        return ''
+    return value['c'] if value['t'] == 'MetaString' else stringify(value['c']) if value['t'] == 'MetaInlines' else ''
+
+def files_hash(options, meta):
+    # The bibliography, style and crossref settings the processing reads
+    hasher = hashlib.sha256()
+    paths = [options[i + 1] for i in range(0, len(options), 2)] + [meta_text(meta.get('csl')), 'pandoc-crossref.yaml']
+    for path in paths:
+        if path and os.path.isfile(path):
+            hasher.update(path.encode('utf8'))
+            with open(path, 'rb') as f:
+                hasher.update(f.read())
+    return hasher.hexdigest()
+
+def process_shard(commands, files, document):
+    source = json.dumps(document)
+    path = cache_path('processed', json.dumps(commands), files, source)
+    with profiling.stage('pandoc:process', cached=os.path.exists(path), length=len(source)):
+        if not os.path.exists(path):
+            data = source.encode('utf8')
+            for command in commands:
+                data = run_step(command, data)
+            write_cached(path, data)
+    with open(path, 'r') as f:
+        processed = json.load(f)
+    processed['blocks'] = [block for block in processed['blocks'] if not is_context(block)]
+    return processed
+
+def process_shards(pool, process, format, documents):
+    # Every shard takes the front matter of the first. citeproc only places
+    # the bibliography in the shard with the #refs div, or the last one.
+    commands, options = process_commands(process, format)
+    meta = documents[0]['meta']
+    files = files_hash(options, meta)
+    found = [list(stubs(document['blocks'])) for document in documents]
+    refs = next((i for i, document in enumerate(documents) if any(node.get('t') == 'Div' and node['c'][0][0] == 'refs' for node in nodes(document['blocks']))), len(documents) - 1)
+
+    def shard(i):
+        return {
+            'pandoc-api-version': documents[i]['pandoc-api-version'],
+            'meta': meta if i == refs else dict(meta, **{'suppress-bibliography': {'t': 'MetaBool', 'c': True}}),
+            'blocks': context([stub for stubs in found[:i] for stub in stubs]) + documents[i]['blocks'] + context([stub for stubs in found[i + 1:] for stub in stubs])
+        }
+
+    processed = list(pool.map(lambda i: process_shard(commands, files, shard(i)), range(len(documents))))
+    # The filters may add to the front matter, but the first shard may also
+    # have had its bibliography suppressed
+    processed[0]['meta'].pop('suppress-bibliography', None)
+    if 'suppress-bibliography' in meta:
+        processed[0]['meta']['suppress-bibliography'] = meta['suppress-bibliography']
+    return processed
+
+def stitch(documents):
+    return {
+        'pandoc-api-version': documents[0]['pandoc-api-version'],
+        'meta': documents[0]['meta'],
+        'blocks': [block for document in documents for block in document['blocks']]
+    }
+
+def run(args, source, output, workers=None):
+    reader, process, writer = split_args(args)
+    with open(source, 'r') as f:
+        texts = split(f.read())
+    os.makedirs(cache_dir, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=workers or min(len(texts), os.cpu_count() or 1)) as pool:
+        documents = list(pool.map(lambda text: read_shard(reader, text), texts))
+        assign_identifiers(documents)
+        if process:
+            documents = process_shards(pool, process, output_format(writer, output), documents)
+    stitched = os.path.join(cache_dir, 'stitched-{}.json'.format(os.path.basename(source)))
+    with open(stitched, 'w') as f:
+        json.dump(stitch(documents), f)
+    with profiling.stage('pandoc:global'):
+        run_step(['pandoc', '--from', 'json'] + writer + [stitched, '-o', output])
+
+if __name__ == '__main__':
+    # python shards.py source output [pandoc arguments...], so a build can be
+    # run as its own process and stopped
+    try:
+        run(sys.argv[3:], sys.argv[1], sys.argv[2])
+    except subprocess.CalledProcessError as error:
+        sys.stderr.write(error.stderr)
+        raise SystemExit(error.returncode)
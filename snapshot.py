@@ -0,0 +1,198 @@
+import csv
+import hashlib
+import io
+import json
+import mmap
+import os
+import struct
+import sys
+from zipfile import ZipFile
+import numpy as np
+import dataset
+import msc_index
+import profiling
+
+# Everything compile.py reads from results/ in one binary file: the tables
+# from all_data.zip, library_stats.csv, the MSC index and the classification
+# columns. The file is memory mapped, the classification columns are used
+# straight from the mapping and every string column is a single decode, so
+# loading it costs next to nothing. It records a hash of the files it was
+# made from and is ignored once any of them change.
+#
+#   python snapshot.py
+path = os.path.join('.build_cache', 'snapshot.bin')
+sources = ['results/all_data.zip', 'results/library_stats.csv', 'results/classification.csv']
+# Bumped whenever the layout of the snapshot changes
+version = 2
+magic = b'THESIS-SNAPSHOT\n'
+
+zip_tables = {
+    'itps': 'itps.csv',
+    'generators': 'counterExampleGenerators.csv',
+    'integrations': 'counterExampleIntegrations.csv',
+    'libraries': 'libraries.csv'
+}
+package_arrays = ['itp', 'library', 'msc', 'verified', 'reviewed']
+package_names = ['itp_names', 'library_names', 'msc_names']
+
+class Sources:
+    def __init__(self, msc, tables, packages, fields):
+        self.msc = msc
+        self.tables = tables
+        self.packages = packages
+        # The header of every table
+        self.fields = fields
+
+@profiling.stage('snapshot:hash')
+def source_hash():
+    hasher = hashlib.sha256(str(version).encode('utf8'))
+    for source in sources:
+        hasher.update(source.encode('utf8'))
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 16), b''):
+                hasher.update(chunk)
+    return hasher.hexdigest()
+
+def read_csv(f):
+    # A short row has None for its missing fields. The extra fields of a long
+    # row, which DictReader puts under None, are dropped, the snapshot has
+    # nowhere to keep them.
+    reader = csv.DictReader(f)
+    rows = list(reader)
+    for row in rows:
+        row.pop(None, None)
+    return rows, reader.fieldnames or []
+
+def read_table(all_data, name):
+    # Decodes while the member is being decompressed, rather than reading
+    # every line as bytes first
+    with all_data.open(name, mode='r') as f:
+        return read_csv(io.TextIOWrapper(f, encoding='utf8', newline=''))
+
+@profiling.stage('snapshot:read')
+def read():
+    # Parses the sources themselves, used whenever the snapshot is stale
+    with ZipFile('results/all_data.zip', 'r') as all_data:
+        with all_data.open("msc.json", mode='r') as mscFile:
+            msc = msc_index.load(mscFile.read())
+        read = {name: read_table(all_data, member) for name, member in zip_tables.items()}
+    with open("results/library_stats.csv", "r", newline='') as libstats:
+        read['libstats'] = read_csv(libstats)
+    tables = {name: rows for name, (rows, _) in read.items()}
+    fields = {name: fieldnames for name, (_, fieldnames) in read.items()}
+    return Sources(msc, tables, dataset.load("results/classification.csv"), fields)
+
+def pack_strings(values):
+    # None is stored as empty and listed in the mask of positions that are None
+    for value in values:
+        if value is not None and '\0' in value:
+            raise ValueError('Cannot store {!r} in a snapshot'.format(value))
+    nulls = [i for i, value in enumerate(values) if value is None]
+    return '\0'.join(value or '' for value in values).encode('utf8'), nulls
+
+def unpack_strings(buffer, count, nulls=()):
+    values = bytes(buffer).decode('utf8').split('\0') if count else []
+    for i in nulls:
+        values[i] = None
+    return values
+
+@profiling.stage('snapshot:write')
+def write(source, digest, output=path):
+    sections = {}
+    payload = []
+    offset = 0
+
+    def add(name, data, **details):
+        nonlocal offset
+        sections[name] = dict(details, offset=offset, length=len(data))
+        payload.append(data)
+        # Keeps every array aligned for its dtype
+        padding = -len(data) % 8
+        payload.append(b'\0' * padding)
+        offset += len(data) + padding
+
+    def add_strings(name, values):
+        data, nulls = pack_strings(values)
+        add(name, data, count=len(values), nulls=nulls)
+
+    add_strings('msc_index_codes', source.msc.codes)
+    add_strings('msc_index_names', source.msc.names)
+    for name, rows in source.tables.items():
+        fieldnames = source.fields[name]
+        add_strings(name + '_fields', fieldnames)
+        add_strings(name + '_cells', [row.get(field) for row in rows for field in fieldnames])
+    for name in package_names:
+        add_strings(name, getattr(source.packages, name).tolist())
+    for name in package_arrays:
+        column = np.ascontiguousarray(getattr(source.packages, name))
+        add(name, column.tobytes(), dtype=column.dtype.str, count=len(column))
+
+    header = json.dumps({'hash': digest, 'tables': list(source.tables), 'sections': sections}).encode('utf8')
+    header += b' ' * (-(len(magic) + 8 + len(header)) % 8)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    partial = output + '.partial'
+    with open(partial, 'wb') as f:
+        f.write(magic)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        for data in payload:
+            f.write(data)
+    os.replace(partial, output)
+
+@profiling.stage('snapshot:load')
+def load(digest, snapshot=path):
+    # The snapshot, or None when it is missing or was made from other sources
+    if not os.path.exists(snapshot):
+        return None
+    with open(snapshot, 'rb') as f:
+        if f.read(len(magic)) != magic:
+            return None
+        header_length, = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_length))
+        if header['hash'] != digest:
+            return None
+        start = len(magic) + 8 + header_length
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    sections = header['sections']
+
+    def section(name):
+        details = sections[name]
+        return view[start + details['offset']:start + details['offset'] + details['length']]
+
+    def strings(name):
+        return unpack_strings(section(name), sections[name]['count'], sections[name]['nulls'])
+
+    msc = msc_index.MscIndex(strings('msc_index_codes'), strings('msc_index_names'))
+    tables = {}
+    fields = {}
+    for name in header['tables']:
+        fieldnames = strings(name + '_fields')
+        cells = strings(name + '_cells')
+        width = len(fieldnames)
+        tables[name] = [dict(zip(fieldnames, cells[i:i + width])) for i in range(0, len(cells), width)] if width else []
+        fields[name] = fieldnames
+    columns = {name: dataset.names_array(strings(name)) for name in package_names}
+    for name in package_arrays:
+        columns[name] = np.frombuffer(section(name), dtype=sections[name]['dtype'], count=sections[name]['count'])
+    return Sources(msc, tables, dataset.Packages(columns), fields)
+
+def current():
+    # The snapshot when it is up to date, otherwise the parsed sources, which
+    # are written to a new snapshot for the next run
+    return update()
+
+def update():
+    # Writes a new snapshot if the sources have changed since the last one
+    digest = source_hash()
+    loaded = load(digest)
+    if loaded is not None:
+        return loaded
+    source = read()
+    write(source, digest)
+    return source
+
+if __name__ == '__main__':
+    digest = source_hash()
+    write(read(), digest, sys.argv[1] if len(sys.argv) > 1 else path)
+    print('Wrote snapshot of {}'.format(', '.join(sources)))
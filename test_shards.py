@@ -0,0 +1,116 @@
+import os
+import shutil
+import subprocess
+import pytest
+import shards
+
+def header(level, text, identifier=''):
+    words = [{'t': 'Str', 'c': word} for word in text.split()]
+    inlines = [inline for word in words for inline in (word, {'t': 'Space'})][:-1]
+    return {'t': 'Header', 'c': [level, [identifier, [], []], inlines]}
+
+def link(text, url):
+    return {'t': 'Link', 'c': [['', [], []], [{'t': 'Str', 'c': text}], [url, '']]}
+
+def document(*blocks):
+    return {'pandoc-api-version': [1, 23], 'meta': {}, 'blocks': list(blocks)}
+
+def identifiers(documents):
+    return [[found['c'][1][0] for found in shards.headers(document['blocks'])] for document in documents]
+
+def test_identifiers_follow_document_order():
+    documents = [
+        document(header(1, 'Foo')),
+        document(header(1, 'Foo'), header(2, 'Foo', 'foo-2'), {'t': 'Div', 'c': [['', [], []], [header(2, 'Foo')]]}, {'t': 'Para', 'c': [link('Foo', '#')]}),
+        document(header(1, '2.1 Results: the (best) bits'), header(1, '1984'), {'t': 'Para', 'c': [link('Elsewhere', '#')]})
+    ]
+    shards.assign_identifiers(documents)
+    # Explicit identifiers are kept and taken as they come, like pandoc does
+    assert identifiers(documents) == [['foo'], ['foo-1', 'foo-2', 'foo-3'], ['results-the-best-bits', 'section']]
+    # [Foo] goes to the first heading with that text, even in another chapter
+    assert documents[1]['blocks'][3]['c'][0]['c'][2][0] == '#foo'
+    assert documents[2]['blocks'][2]['c'][0]['c'][2][0] == '#'
+
+def test_split_args():
+    args = ['--from', 'markdown+pipe_tables', '--template', 'mytemplate.md', '-F', 'pandoc-csv2table', '-F', 'pandoc-crossref', '--mathjax', '-C', '--bibliography', 'refs.json']
+    reader, process, writer = shards.split_args(args)
+    assert reader == ['--from', 'markdown+pipe_tables-auto_identifiers', '-F', 'pandoc-csv2table']
+    assert process == ['-F', 'pandoc-crossref', '-C', '--bibliography', 'refs.json']
+    assert writer == ['--template', 'mytemplate.md', '--mathjax']
+    commands, options = shards.process_commands(process, 'latex')
+    assert commands == [['pandoc-crossref', 'latex'], ['pandoc', '--from', 'json', '--citeproc', '--bibliography', 'refs.json', '--to', 'json']]
+
+# Repeated headings, crossref labels and citations in every chapter, with
+# references forwards and backwards between them
+thesis = '''---
+title: Shards
+numbersections: true
+link-citations: true
+references:
+- id: knuth
+  type: book
+  title: The Art of Computer Programming
+  author: [{family: Knuth, given: Donald}]
+  issued: {date-parts: [[1968]]}
+- id: lamport
+  type: book
+  title: Specifying Systems
+  author: [{family: Lamport, given: Leslie}]
+  issued: {date-parts: [[2002]]}
+- id: milner
+  type: article-journal
+  title: A Theory of Type Polymorphism in Programming
+  author: [{family: Milner, given: Robin}]
+  issued: {date-parts: [[1978]]}
+---
+
+Before the first chapter [@lamport].
+
+# Introduction
+
+## Foo
+
+See @fig:plot, @tbl:numbers and @sec:later, as in [@knuth; @milner].
+
+![A plot](plot.png){#fig:plot}
+
+# Foo
+
+## Foo
+
+## Foo {#foo-3}
+
+## Foo
+
+Back to [Foo] and @fig:plot, again [@lamport], then @eq:sum.
+
+$$ 1 + 1 = 2 $$ {#eq:sum}
+
+# Later {#sec:later}
+
+| a | b |
+|---|---|
+| 1 | 2 |
+
+: Numbers {#tbl:numbers}
+
+Finally [@milner].
+
+# References
+
+::: {#refs}
+:::
+'''
+
+@pytest.mark.skipif(shutil.which('pandoc') is None or shutil.which('pandoc-crossref') is None, reason='needs pandoc and pandoc-crossref')
+@pytest.mark.parametrize('output', ['thesis.html', 'thesis.tex'])
+def test_matches_monolithic_run(tmp_path, monkeypatch, output):
+    csl = os.path.abspath('acm.csl')
+    monkeypatch.chdir(tmp_path)
+    with open('thesis.md', 'w') as f:
+        f.write(thesis)
+    args = ['--from', 'markdown', '-F', 'pandoc-crossref', '-C', '--csl', csl]
+    subprocess.run(['pandoc'] + args + ['thesis.md', '-o', 'monolithic-' + output], check=True)
+    shards.run(args, 'thesis.md', 'sharded-' + output)
+    with open('monolithic-' + output) as monolithic, open('sharded-' + output) as sharded:
+        assert sharded.read() == monolithic.read()
@@ -0,0 +1,69 @@
+import json
+import os
+from zipfile import ZipFile
+import numpy as np
+import pytest
+import snapshot
+
+msc = [{
+    'code': '03-XX',
+    'short_name': 'Mathematical logic [and foundations]',
+    'subclassifications': [{'code': '03Bxx', 'name': 'General logic', 'classifications': [{'code': '03B70', 'name': 'Logic in computer science'}]}],
+    'classifications': []
+}]
+
+# Blank lines, short rows and long rows in every kind of table
+tables = {
+    'itps.csv': 'Name,Logic,Homepage\nLean,Dependent types,https://leanprover.github.io\n\nCoq,CIC\nHOL4,HOL,https://hol-theorem-prover.org,extra\n',
+    'counterExampleGenerators.csv': 'name,description\nNitpick,Finds counterexamples\n',
+    'counterExampleIntegrations.csv': 'prover,name\nIsabelle\n',
+    'libraries.csv': 'name,section,file,url\nLean,mathlib,mathlib.csv,\nCoq,std,std.csv,https://coq.inria.fr,1,2\n'
+}
+library_stats = 'ITP,Library,Total,Verified\nLean,mathlib,10,4\nCoq,std,3\n'
+classification = 'ITP,Library,Name,MSC,Verified\nLean,mathlib,a,03B70,Yes\n\nCoq,std,b\nCoq,std,c,,\n'
+
+@pytest.fixture
+def sources(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('results')
+    with ZipFile('results/all_data.zip', 'w') as all_data:
+        all_data.writestr('msc.json', json.dumps(msc))
+        for name, text in tables.items():
+            all_data.writestr(name, text)
+    with open('results/library_stats.csv', 'w') as f:
+        f.write(library_stats)
+    with open('results/classification.csv', 'w') as f:
+        f.write(classification)
+
+def assert_same(a, b):
+    assert a.msc.codes == b.msc.codes
+    assert a.msc.names == b.msc.names
+    assert a.tables == b.tables
+    assert a.fields == b.fields
+    for name in snapshot.package_names + snapshot.package_arrays:
+        np.testing.assert_array_equal(getattr(a.packages, name), getattr(b.packages, name))
+
+def test_load_matches_read(sources):
+    read = snapshot.read()
+    digest = snapshot.source_hash()
+    snapshot.write(read, digest)
+    loaded = snapshot.load(digest)
+    assert loaded is not None
+    assert_same(loaded, read)
+    # Missing cells are None on both paths, and the extra cells are dropped
+    assert loaded.tables['itps'][1] == {'Name': 'Coq', 'Logic': 'CIC', 'Homepage': None}
+    assert loaded.tables['itps'][2] == {'Name': 'HOL4', 'Logic': 'HOL', 'Homepage': 'https://hol-theorem-prover.org'}
+    assert loaded.tables['libraries'][0]['url'] == ''
+
+def test_current_writes_snapshot(sources):
+    assert not os.path.exists(snapshot.path)
+    first = snapshot.current()
+    assert snapshot.load(snapshot.source_hash()) is not None
+    assert_same(snapshot.current(), first)
+
+def test_stale_snapshot_is_ignored(sources):
+    snapshot.current()
+    with open('results/library_stats.csv', 'a') as f:
+        f.write('HOL4,core,5,5\n')
+    assert snapshot.load(snapshot.source_hash()) is None
+    assert snapshot.current().tables['libstats'][-1]['ITP'] == 'HOL4'